@@ -1,5 +1,6 @@
 import React, { useState } from "react";
 import { useNavigate, useLocation } from "react-router-dom";
+import { waitForJob } from "./jobs";
 
 export default function GoogleDocsPage() {
   const navigate = useNavigate();
@@ -31,7 +32,12 @@ export default function GoogleDocsPage() {
       });
       const data = await res.json().catch(() => ({}));
       if (res.ok) {
-        setMsg("Success (JSON): " + JSON.stringify(data));
+        const job = await waitForJob(data.job_id);
+        if (job.status === "succeeded") {
+          setMsg("Success (JSON): " + JSON.stringify(job.result));
+        } else {
+          setMsg("Error (JSON): " + JSON.stringify({ error: job.error }));
+        }
       } else {
         setMsg("Error (JSON): " + JSON.stringify(data));
       }
@@ -60,7 +66,12 @@ export default function GoogleDocsPage() {
       });
       const data = await res.json().catch(() => ({}));
       if (res.ok) {
-        setMsg("Success (Upload): " + JSON.stringify(data));
+        const job = await waitForJob(data.job_id);
+        if (job.status === "succeeded") {
+          setMsg("Success (Upload): " + JSON.stringify(job.result));
+        } else {
+          setMsg("Error (Upload): " + JSON.stringify({ error: job.error }));
+        }
       } else {
         setMsg("Error (Upload): " + JSON.stringify(data));
       }
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from "react";
 import { useStepsCompletion } from "./StepsCompletionContext";
 import { useNavigate } from "react-router-dom";
+import { waitForJob } from "./jobs";
 
 const LinkToolsPage = () => {
   const [googleDocsData, setGoogleDocsData] = useState(null);
@@ -102,26 +103,29 @@ const LinkToolsPage = () => {
         googleDocsRequest,
       ]);
 
-      // Handle GitHub response
-      if (githubResponse.ok) {
-        const data = await githubResponse.json();
-        setResponseMessage((prev) => prev + "GitHub: " + JSON.stringify(data) + "\n");
-      } else {
-        const errorData = await githubResponse.json();
-        setResponseMessage((prev) => prev + "GitHub Error: " + JSON.stringify(errorData) + "\n");
-      }
+      // Both endpoints queue a background job; wait for each one to finish
+      const settle = async (label, response) => {
+        const data = await response.json();
+        if (!response.ok) {
+          setResponseMessage((prev) => prev + label + " Error: " + JSON.stringify(data) + "\n");
+          return false;
+        }
+        const job = await waitForJob(data.job_id);
+        if (job.status !== "succeeded") {
+          setResponseMessage((prev) => prev + label + " Error: " + JSON.stringify({ error: job.error }) + "\n");
+          return false;
+        }
+        setResponseMessage((prev) => prev + label + ": " + JSON.stringify(job.result) + "\n");
+        return true;
+      };
 
-      // Handle Google Docs response
-      if (googleDocsResponse.ok) {
-        const data = await googleDocsResponse.json();
-        setResponseMessage((prev) => prev + "Google Docs: " + JSON.stringify(data) + "\n");
-      } else {
-        const errorData = await googleDocsResponse.json();
-        setResponseMessage((prev) => prev + "Google Docs Error: " + JSON.stringify(errorData) + "\n");
-      }
+      const [githubOk, googleDocsOk] = await Promise.all([
+        settle("GitHub", githubResponse),
+        settle("Google Docs", googleDocsResponse),
+      ]);
 
       // Navigate to the next page if both requests succeed
-      if (githubResponse.ok && googleDocsResponse.ok) {
+      if (githubOk && googleDocsOk) {
         setStepsCompletion((prev) => ({ ...prev, step1: true }));
         navigate("/teamio", { state: { teamId: teamId } });
       }
@@ -0,0 +1,15 @@
+// Ingestion endpoints queue a background job and return { job_id } right away.
+// Poll the job until it finishes and resolve with the final job object.
+export const waitForJob = async (jobId, intervalMs = 1000) => {
+  while (true) {
+    const res = await fetch(`http://localhost:3000/api/jobs/${jobId}`);
+    const job = await res.json();
+    if (!res.ok) {
+      throw new Error(job.detail || "Could not load job status");
+    }
+    if (job.status === "succeeded" || job.status === "failed") {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
@@ -0,0 +1,77 @@
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from scripts import post_docs_data
+from benchmarks.synthetic import docs_export
+
+# Docs revision processing on a synthetic export, against the previous per-block helpers.
+# Run from teamio-backend:  python -m benchmarks.bench_docs_processing [blocks]
+
+def legacy_count_words(text: str) -> int:
+    return len(re.findall(r"\b\w+\b", text))
+
+def legacy_fmt_title_from_ts(ts: str, type_str: str) -> str:
+    try:
+        iso = ts.replace("Z", "+00:00")
+        dt = datetime.fromisoformat(iso)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return f"{type_str} — {dt.strftime('%Y-%m-%d %H:%M:%S')}"
+    except Exception:
+        return f"{type_str} — {ts or 'Unknown'}"
+
+def legacy_fmt_titles(stamps, type_str: str):
+    return [legacy_fmt_title_from_ts(ts, type_str) for ts in stamps]
+
+@contextmanager
+def legacy_helpers():
+    names = ("count_words", "_fmt_title_from_ts", "fmt_titles_from_ts")
+    saved = [getattr(post_docs_data, name) for name in names]
+    for name, fn in zip(names, (legacy_count_words, legacy_fmt_title_from_ts, legacy_fmt_titles)):
+        setattr(post_docs_data, name, fn)
+    try:
+        yield
+    finally:
+        for name, fn in zip(names, saved):
+            setattr(post_docs_data, name, fn)
+
+def best_of(fn, repeat: int = 3) -> float:
+    # Every run starts cold, so the per-record title cache can't carry results between runs
+    timings = []
+    for _ in range(repeat):
+        getattr(post_docs_data._fmt_title_from_ts, "cache_clear", lambda: None)()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main(blocks: int = 100_000):
+    doc = docs_export(blocks, threads=0)
+    texts = [b["finalText"] for b in doc["revision"]["blocks"]]
+    stamps = [b["timestamp"] for b in doc["revision"]["blocks"]]
+
+    legacy_titles = legacy_fmt_titles(stamps, "Revision")
+    assert [legacy_count_words(t) for t in texts] == [post_docs_data.count_words(t) for t in texts]
+    assert legacy_titles == post_docs_data.fmt_titles_from_ts(stamps, "Revision")
+    assert legacy_titles == [post_docs_data._fmt_title_from_ts(ts, "Revision") for ts in stamps]
+
+    with legacy_helpers():
+        legacy_total = best_of(lambda: post_docs_data.process_docs_revisions(doc))
+    current_total = best_of(lambda: post_docs_data.process_docs_revisions(doc))
+
+    legacy_format = best_of(lambda: legacy_fmt_titles(stamps, "Revision"))
+    rows = [
+        ("word count", best_of(lambda: [legacy_count_words(t) for t in texts]), best_of(lambda: [post_docs_data.count_words(t) for t in texts])),
+        ("title format (batch)", legacy_format, best_of(lambda: post_docs_data.fmt_titles_from_ts(stamps, "Revision"))),
+        ("title format (record)", legacy_format, best_of(lambda: [post_docs_data._fmt_title_from_ts(ts, "Revision") for ts in stamps])),
+        ("process_docs_revisions", legacy_total, current_total),
+    ]
+    print(f"{blocks} blocks")
+    print(f"{'':<24}{'legacy (s)':>12}{'current (s)':>12}{'speedup':>10}")
+    for name, legacy, current in rows:
+        print(f"{name:<24}{legacy:>12.3f}{current:>12.3f}{legacy / current:>9.1f}x")
+
+if __name__ == "__main__":
+    import sys
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
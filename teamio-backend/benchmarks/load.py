@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks import harness, mock_github, synthetic
+
+# End-to-end benchmark: synthetic teams, each with a GitHub repository (served by a local mock
+# GitHub) and Google Docs exports, pushed through the real ingestion code into the in-memory
+# storage backend, then every FastAPI endpoint driven under concurrent load over HTTP.
+#
+# Run from teamio-backend:
+#   python -m benchmarks.load                          # the "default" profile
+#   python -m benchmarks.load --profile smoke --compare  # check against benchmarks/baselines/smoke.json
+#   python -m benchmarks.load --profile smoke --save-baseline
+#
+# Reported per ingestion phase and per endpoint: throughput, p50/p95/p99 latency and errors,
+# plus the process's peak RSS (the app, the mock GitHub server and the load generator share
+# one process, so it's an upper bound for the app). --compare exits with status 1 when a p95
+# latency or a throughput is worse than the baseline by more than --tolerance. Baselines are only
+# comparable on the machine that recorded them, so re-record them (--save-baseline) after a move.
+#
+# GitHub syncs are timed one at a time, so per-sync latency stays comparable between runs;
+# benchmarks/stress_sync.py runs them concurrently.
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+PROFILES = {
+    "smoke": dict(teams=2, branches=2, commits=60, prs=8, comments=2, docs=1, blocks=300, threads=10,
+                  requests=100, concurrency=8, github_latency_ms=5),
+    "default": dict(teams=5, branches=3, commits=300, prs=30, comments=4, docs=2, blocks=2000, threads=30,
+                    requests=500, concurrency=32, github_latency_ms=20),
+}
+
+def _configure_environment(workdir: str, github_url: str, quiet: bool):
+    # Read at import time by the app and the scripts modules, so this runs before they're imported.
+    # The app and scripts log through logging (to stderr); quiet runs only let warnings and errors through.
+    if quiet:
+        os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ["GITHUB_API_URL"] = github_url
+    os.environ["GITHUB_TOKEN"] = "benchmark-token"
+    os.environ["GITHUB_CACHE_DIR"] = os.path.join(workdir, "github_cache")
+    os.environ["JOBS_DB_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["DOCS_UPLOAD_DIR"] = os.path.join(workdir, "docs_uploads")
+
+def _team(i: int) -> Dict[str, str]:
+    return {"team_id": f"bench-team-{i}", "owner": f"bench-org-{i}", "repo": "project"}
+
+async def _timed(fn, *args):
+    started = time.perf_counter()
+    result = await fn(*args)
+    return time.perf_counter() - started, result
+
+async def bench_ingestion(cfg: Dict[str, Any], teams: List[Dict[str, str]], docs: Dict[str, List[dict]], github_app) -> Dict[str, Dict]:
+    from scripts.fetch_github_data import fetch_data_async
+    from scripts.post_github_data import post_to_db
+    from scripts.post_docs_data import post_docs_to_db
+
+    phases = {}
+    fetched = {}
+    for label in ("fetch_github", "fetch_github_cached"):
+        # The second pass finds every page in the ETag cache and every commit in the stats cache
+        latencies, items, requests_before = [], 0, github_app.state.requests
+        started = time.perf_counter()
+        for team in teams:
+            incomplete = []
+            elapsed, (commit_data, pr_data) = await _timed(
+                fetch_data_async, team["owner"], team["repo"], False, False, os.environ["GITHUB_TOKEN"], {}, incomplete
+            )
+            latencies.append(elapsed)
+            items += len(commit_data) + len(pr_data)
+            fetched[team["team_id"]] = (commit_data, pr_data)
+        phases[label] = harness.summarize(latencies, time.perf_counter() - started, items=items)
+        phases[label]["github_requests"] = github_app.state.requests - requests_before
+
+    latencies, items = [], 0
+    started = time.perf_counter()
+    for team in teams:
+        commit_data, pr_data = fetched[team["team_id"]]
+        elapsed, _ = await _timed(asyncio.to_thread, post_to_db, commit_data, pr_data, team["team_id"])
+        latencies.append(elapsed)
+        items += len(commit_data) + len(pr_data)
+    phases["post_github"] = harness.summarize(latencies, time.perf_counter() - started, items=items)
+
+    latencies, items = [], 0
+    started = time.perf_counter()
+    for team in teams:
+        for doc in docs[team["team_id"]]:
+            elapsed, _ = await _timed(asyncio.to_thread, post_docs_to_db, copy.deepcopy(doc), team["team_id"])
+            latencies.append(elapsed)
+            items += len(doc["revision"]["blocks"]) + len(doc["comments"]["threads"])
+    phases["post_docs"] = harness.summarize(latencies, time.perf_counter() - started, items=items)
+    return phases
+
+def _endpoint_specs(teams: List[Dict[str, str]], records: List[tuple], job_id: str, small_doc: dict) -> Dict[str, Any]:
+    """name -> factory(rng) returning the keyword arguments of one httpx request."""
+    def team(rng):
+        return rng.choice(teams)
+
+    def get(path, **params):
+        return {"method": "GET", "url": path, "params": params}
+
+    def record_params(rng):
+        tool, metric, cid = rng.choice(records)
+        return {"tool": tool, "metric": metric, "contribution_id": cid}
+
+    def upload_files(rng, count=1):
+        return [("files" if count > 1 else "file", (f"doc{n}.json", json.dumps(small_doc).encode("utf-8"), "application/json"))
+                for n in range(count)]
+
+    return {
+        "contributions_all": lambda rng: get("/api/contributions/all", team_id=team(rng)["team_id"]),
+        "contributions_page": lambda rng: get("/api/contributions/all", team_id=team(rng)["team_id"], limit=50),
+        "contributions_filtered": lambda rng: get("/api/contributions/all", team_id=team(rng)["team_id"], tool="github", metric="commit", limit=50),
+        "contributions_ndjson": lambda rng: get("/api/contributions/all", team_id=team(rng)["team_id"], limit=200, format="ndjson",
+                                                fields="contribution_id,author,timestamp,title"),
+        "team_logins": lambda rng: get("/api/teams/map-logins", team_id=team(rng)["team_id"]),
+        "mapped_users": lambda rng: get("/api/teams/mapped-users", team_id=team(rng)["team_id"]),
+        "reflections_commits": lambda rng: get("/api/reflections/commits", team_id=team(rng)["team_id"]),
+        "reflections_feedback": lambda rng: get("/api/reflections/feedback", team_id=team(rng)["team_id"]),
+        "reflections_revisions": lambda rng: get("/api/reflections/revisions", team_id=team(rng)["team_id"]),
+        "log_data": lambda rng: get("/api/log_data", **record_params(rng)),
+        "log_data_fields": lambda rng: get("/api/log_data", fields="title,timestamp", **record_params(rng)),
+        "cache_stats": lambda rng: get("/api/cache/stats"),
+        "job_status": lambda rng: get(f"/api/jobs/{job_id}"),
+        # Writes last: they invalidate the team caches and queue background jobs
+        "map_logins": lambda rng: {"method": "POST", "url": "/api/teams/map-logins",
+                                   "params": {"team_id": team(rng)["team_id"]},
+                                   "json": {"mappings": {f"student{rng.randint(0, 4)}": f"netid{rng.randint(0, 4)}"}}},
+        "github_post": lambda rng: (lambda t: {"method": "POST", "url": "/api/github/post",
+                                               "params": {"team_id": t["team_id"], "owner": t["owner"], "repo_name": t["repo"], "incremental": "true"}})(team(rng)),
+        "google_docs_post": lambda rng: {"method": "POST", "url": "/api/google_docs/post",
+                                         "json": {"team_id": team(rng)["team_id"], "doc": small_doc}},
+        "google_docs_upload": lambda rng: {"method": "POST", "url": "/api/google_docs/upload",
+                                           "data": {"team_id": team(rng)["team_id"]}, "files": upload_files(rng)},
+        "google_docs_bulk": lambda rng: {"method": "POST", "url": "/api/google_docs/bulk",
+                                         "json": {"team_id": team(rng)["team_id"], "docs": [small_doc, small_doc]}},
+        "google_docs_bulk_upload": lambda rng: {"method": "POST", "url": "/api/google_docs/bulk_upload",
+                                                "data": {"team_id": team(rng)["team_id"]}, "files": upload_files(rng, 2)},
+    }
+
+async def drive(client: httpx.AsyncClient, factory, requests: int, concurrency: int, seed: int = 0) -> Dict[str, float]:
+    """
+    Issue `requests` requests from `concurrency` concurrent workers; status >= 400 counts as an error.
+    One unmeasured request per worker goes first, so connections and caches are warm.
+    """
+    rng = random.Random(seed)
+    await asyncio.gather(*[client.request(**factory(rng)) for _ in range(min(concurrency, requests))])
+    pending = [factory(rng) for _ in range(requests)]
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while pending:
+            kwargs = pending.pop()
+            started = time.perf_counter()
+            try:
+                response = await client.request(**kwargs)
+                await response.aread()
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return harness.summarize(latencies, time.perf_counter() - started, errors)
+
+async def bench_endpoints(base_url: str, cfg: Dict[str, Any], teams: List[Dict[str, str]], only: List[str] = None) -> Dict[str, Dict]:
+    from scripts import storage
+
+    records = []
+    for team in teams:
+        for cid, c in (storage.reference(f"contributions/{team['team_id']}").get() or {}).items():
+            records.append((c.get("tool"), c.get("metric"), cid))
+    small_doc = synthetic.docs_export(blocks=20, threads=2, file_id="bench-small", team="bench-team-0")
+
+    limits = httpx.Limits(max_connections=cfg["concurrency"], max_keepalive_connections=cfg["concurrency"])
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        response = await client.post("/api/google_docs/post", json={"team_id": teams[0]["team_id"], "doc": small_doc})
+        job_id = response.json()["job_id"]
+        results = {}
+        for name, factory in _endpoint_specs(teams, records, job_id, small_doc).items():
+            if only and name not in only:
+                continue
+            results[name] = await drive(client, factory, cfg["requests"], cfg["concurrency"])
+    return results
+
+def run(cfg: Dict[str, Any], profile: str, only: List[str] = None, quiet: bool = True) -> Dict[str, Any]:
+    teams = [_team(i) for i in range(cfg["teams"])]
+    repos = {
+        f"{t['owner']}/{t['repo']}": synthetic.github_repo(
+            t["owner"], t["repo"], cfg["branches"], cfg["commits"], cfg["prs"], cfg["comments"], seed=i
+        )
+        for i, t in enumerate(teams)
+    }
+    docs = {
+        t["team_id"]: [synthetic.docs_export(cfg["blocks"], cfg["threads"], f"{t['team_id']}-doc{d}", t["team_id"])
+                       for d in range(cfg["docs"])]
+        for t in teams
+    }
+    github_app = mock_github.create_app(repos, latency=cfg["github_latency_ms"] / 1000)
+
+    result = {
+        "profile": profile,
+        "config": cfg,
+        "python": platform.python_version(),
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    with tempfile.TemporaryDirectory() as workdir, harness.serve(github_app, lifespan="off") as github_url:
+        _configure_environment(workdir, github_url, quiet)
+        import main
+
+        result["phases"] = asyncio.run(bench_ingestion(cfg, teams, docs, github_app))
+        result["peak_rss_mb_after_ingestion"] = harness.peak_rss_mb()
+        with harness.serve(main.app) as app_url:
+            result["endpoints"] = asyncio.run(bench_endpoints(app_url, cfg, teams, only))
+        result["peak_rss_mb"] = harness.peak_rss_mb()
+    return result
+
+def report(result: Dict[str, Any], baseline: Dict[str, Any] = None, tolerance: float = 0.5) -> List[str]:
+    """Print the results (with changes against the baseline); returns the regressions found."""
+    regressions = []
+    header = f"{'':<26}{'count':>7}{'err':>5}{'per s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"{'p95 vs base':>13}{'per s vs base':>15}"
+    for section in ("phases", "endpoints"):
+        print(f"\n{section}")
+        print(header)
+        for name, row in result.get(section, {}).items():
+            line = (f"{name:<26}{row['count']:>7}{row['errors']:>5}{row['throughput_per_s']:>10.1f}"
+                    f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+            base = (baseline or {}).get(section, {}).get(name)
+            if base:
+                p95_change = (row["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+                rate_change = (row["throughput_per_s"] - base["throughput_per_s"]) / base["throughput_per_s"] if base["throughput_per_s"] else 0.0
+                line += f"{p95_change:>+12.0%} {rate_change:>+14.0%}"
+                if p95_change > tolerance:
+                    regressions.append(f"{section}/{name}: p95 {base['p95_ms']}ms -> {row['p95_ms']}ms")
+                if rate_change < -tolerance:
+                    regressions.append(f"{section}/{name}: throughput {base['throughput_per_s']}/s -> {row['throughput_per_s']}/s")
+            if row["errors"]:
+                regressions.append(f"{section}/{name}: {row['errors']} error(s)")
+            print(line)
+    print(f"\npeak RSS {result['peak_rss_mb']} MB (after ingestion {result['peak_rss_mb_after_ingestion']} MB)")
+    if baseline:
+        print(f"baseline: {baseline.get('created')} (python {baseline.get('python')})")
+    return regressions
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="End-to-end ingestion and API benchmark")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    for key, value in PROFILES["default"].items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), dest=key, help=f"override the profile's {key}")
+    parser.add_argument("--only", help="comma-separated endpoint names to drive (default: all)")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--save-baseline", nargs="?", const="", metavar="NAME", help="store the results as baselines/NAME.json (default: the profile name)")
+    parser.add_argument("--compare", nargs="?", const="", metavar="NAME", help="compare with baselines/NAME.json (default: the profile name)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed fractional regression before --compare fails (default 0.5)")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's info-level logging")
+    args = parser.parse_args(argv)
+
+    cfg = dict(PROFILES[args.profile])
+    cfg.update({k: getattr(args, k) for k in cfg if getattr(args, k) is not None})
+    only = [n.strip() for n in args.only.split(",")] if args.only else None
+
+    result = run(cfg, args.profile, only, quiet=not args.verbose)
+
+    baseline = None
+    if args.compare is not None:
+        path = os.path.join(BASELINE_DIR, f"{args.compare or args.profile}.json")
+        with open(path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != cfg:
+            print(f"warning: {path} was recorded with a different configuration", file=sys.stderr)
+    regressions = report(result, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline is not None:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline or args.profile}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"saved baseline {path}")
+    if baseline is not None and regressions:
+        print("\nregressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# Local stand-in for the GitHub REST endpoints scripts/fetch_github_data.py calls, serving
+# repositories built by benchmarks/synthetic.github_repo. Lists are paginated with `Link` headers,
+# responses carry ETags (If-None-Match gets a 304) and X-RateLimit-* headers with a full budget,
+# and every response can be delayed by `latency` seconds to model the network round trip.
+# Point the fetcher at it with GITHUB_API_URL=<base url> (see benchmarks/harness.serve).
+#
+# The GraphQL API isn't mocked; scripts/fetch_github_graphql.py would POST to <base url>/graphql.
+
+DEFAULT_PER_PAGE = 30
+MAX_PER_PAGE = 100
+
+def create_app(repos: Dict[str, Dict[str, Any]], latency: float = 0.0) -> Starlette:
+    """repos: {"owner/name": github_repo(...)}. The app's `state.requests` counts requests served."""
+
+    async def respond(request: Request, body: Any, paginate: bool = False) -> Response:
+        if latency:
+            await asyncio.sleep(latency)
+        request.app.state.requests += 1
+        headers = {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "4999",
+            "X-RateLimit-Reset": str(int(time.time()) + 3600),
+        }
+        if paginate:
+            try:
+                per_page = min(MAX_PER_PAGE, max(1, int(request.query_params.get("per_page", DEFAULT_PER_PAGE))))
+                page = max(1, int(request.query_params.get("page", 1)))
+            except ValueError:
+                return JSONResponse({"message": "Invalid pagination"}, status_code=422)
+            start = (page - 1) * per_page
+            if start + per_page < len(body):
+                headers["Link"] = f'<{request.url.include_query_params(page=page + 1)}>; rel="next"'
+            body = body[start:start + per_page]
+        payload = json.dumps(body).encode("utf-8")
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+        headers["ETag"] = etag
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(payload, media_type="application/json", headers=headers)
+
+    def repo_for(request: Request):
+        return repos.get(f"{request.path_params['owner']}/{request.path_params['repo']}")
+
+    def not_found():
+        return JSONResponse({"message": "Not Found"}, status_code=404)
+
+    async def branches(request: Request):
+        repo = repo_for(request)
+        return await respond(request, repo["branches"], paginate=True) if repo else not_found()
+
+    async def commits(request: Request):
+        repo = repo_for(request)
+        if not repo:
+            return not_found()
+        branch = request.query_params.get("sha", "main")
+        if branch not in repo["commits"]:
+            return not_found()
+        listed = repo["commits"][branch]
+        since = request.query_params.get("since")
+        if since:
+            listed = [c for c in listed if c["commit"]["committer"]["date"] >= since]
+        return await respond(request, listed, paginate=True)
+
+    async def commit_detail(request: Request):
+        repo = repo_for(request)
+        detail = repo and repo["commit_details"].get(request.path_params["sha"])
+        return await respond(request, detail) if detail else not_found()
+
+    async def pulls(request: Request):
+        repo = repo_for(request)
+        return await respond(request, repo["pulls"], paginate=True) if repo else not_found()
+
+    def comments(kind: str):
+        async def endpoint(request: Request):
+            repo = repo_for(request)
+            if not repo:
+                return not_found()
+            listed: List[dict] = repo[kind].get(int(request.path_params["number"]), [])
+            return await respond(request, listed, paginate=True)
+        return endpoint
+
+    app = Starlette(routes=[
+        Route("/repos/{owner}/{repo}/branches", branches),
+        Route("/repos/{owner}/{repo}/commits", commits),
+        Route("/repos/{owner}/{repo}/commits/{sha}", commit_detail),
+        Route("/repos/{owner}/{repo}/pulls", pulls),
+        Route("/repos/{owner}/{repo}/issues/{number:int}/comments", comments("issue_comments")),
+        Route("/repos/{owner}/{repo}/pulls/{number:int}/comments", comments("review_comments")),
+    ])
+    app.state.requests = 0
+    return app
@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks import harness, mock_github
+
+# Startup-time benchmark: how long a fresh worker process takes to import the app, to accept
+# connections, and to report ready on GET /api/ready (storage connected). Each run starts
+# `uvicorn main:app` in a new process with the in-memory storage backend and a local mock GitHub
+# (so the connection warmup has somewhere to connect), and polls until each milestone is reached.
+#
+# Run from teamio-backend:
+#   python -m benchmarks.startup                    # 5 runs
+#   python -m benchmarks.startup --runs 10 --max-ready-ms 3000
+#
+# --max-ready-ms exits with status 1 when the median time to ready is over the budget.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _environment(workdir: str, github_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "STORAGE_BACKEND": "memory",
+        "GITHUB_API_URL": github_url,
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "GITHUB_CACHE_DIR": os.path.join(workdir, "github_cache"),
+        "DOCS_UPLOAD_DIR": os.path.join(workdir, "docs_uploads"),
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+def measure_import(env: Dict[str, str]) -> float:
+    """Seconds to import main in a fresh interpreter."""
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def measure_server(env: Dict[str, str], timeout: float = 60) -> Dict[str, float]:
+    """Seconds from spawning uvicorn until it accepts a connection, and until /api/ready returns 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    timings = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while "ready" not in timings:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {proc.returncode}:\n{proc.stderr.read().decode()}")
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError("Timed out waiting for /api/ready")
+                try:
+                    response = client.get("/api/ready")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                timings.setdefault("accepting", time.perf_counter() - started)
+                if response.status_code == 200:
+                    timings["ready"] = time.perf_counter() - started
+                else:
+                    time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return timings
+
+def _stats(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "p50_ms": round(harness.percentile(ordered, 50) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+def run(runs: int) -> Dict[str, Dict[str, float]]:
+    samples = {"import": [], "accepting": [], "ready": []}
+    with tempfile.TemporaryDirectory() as workdir, \
+            harness.serve(mock_github.create_app({}), lifespan="off") as github_url:
+        env = _environment(workdir, github_url)
+        measure_import(env)  # the first run also writes the bytecode caches; don't count it
+        for _ in range(runs):
+            samples["import"].append(measure_import(env))
+            timings = measure_server(env)
+            samples["accepting"].append(timings["accepting"])
+            samples["ready"].append(timings["ready"])
+    return {name: _stats(values) for name, values in samples.items()}
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Worker startup-time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ready-ms", type=float, help="fail when the median time to ready exceeds this")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    result = run(args.runs)
+    print(f"{'milestone':<12}{'p50 ms':>10}{'max ms':>10}")
+    for name, row in result.items():
+        print(f"{name:<12}{row['p50_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.max_ready_ms is not None and result["ready"]["p50_ms"] > args.max_ready_ms:
+        print(f"\nmedian time to ready {result['ready']['p50_ms']}ms is over the {args.max_ready_ms}ms budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
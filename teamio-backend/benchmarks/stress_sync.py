@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks import harness, mock_github, synthetic
+
+# Concurrency stress check for GitHub syncs: many teams sync at once in one app process, and each
+# team must end up with exactly the data it gets when synced on its own.
+#
+#   1. Reference: each team is fetched and written on its own, one after another, and its slice of
+#      the database is recorded.
+#   2. Storage is wiped and the app is served with a job worker per team. Every team's
+#      POST /api/github/post goes in at the same moment and the syncs run side by side on one event loop
+#      (sharing the GitHub connection pool) and in the threadpool.
+#   3. Each team's slice must match the reference. Every record must also belong to the team's own
+#      synthetic repository: the right team_id, the repository's commit SHAs, and authors from the team.
+#
+# Every team's repository is named "project" under a different owner, so a sync that picked up
+# another sync's owner would fetch the wrong data. Runs on the in-memory backend against
+# benchmarks/mock_github.py.
+#
+# Run from teamio-backend:
+#   python -m benchmarks.stress_sync
+#   python -m benchmarks.stress_sync --teams 12 --rounds 3
+#
+# Exits with status 1 if any team's data differs or leaked.
+
+def _configure_environment(workdir: str, github_url: str, workers: int, quiet: bool):
+    # Read at import time by the app and the scripts modules, so this runs before they're imported.
+    # The app and scripts log through logging (to stderr); quiet runs only let warnings and errors through.
+    if quiet:
+        os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ["GITHUB_API_URL"] = github_url
+    os.environ["GITHUB_TOKEN"] = "stress-token"
+    os.environ["GITHUB_CACHE_DIR"] = os.path.join(workdir, "github_cache")
+    os.environ["JOBS_DB_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["JOB_WORKERS"] = str(workers)
+    os.environ["JOB_POLL_INTERVAL"] = "0.05"
+
+def _team(i: int) -> Dict[str, str]:
+    return {"team_id": f"stress-team-{i}", "owner": f"stress-org-{i}", "repo": "project"}
+
+def team_slice(team_id: str) -> Dict[str, Any]:
+    """Everything a GitHub sync writes for one team."""
+    from scripts import storage
+
+    contributions = storage.reference(f"contributions/{team_id}").get() or {}
+    commit_ids = [cid for cid, c in contributions.items() if c.get("metric") == "commit"]
+    return {
+        "contributions": contributions,
+        "commits": {cid: storage.reference(f"log_data/github/commit/{cid}").get() for cid in commit_ids},
+        "team_log_data": storage.reference(f"team_log_data/{team_id}").get(),
+        "logins": storage.reference(f"teams/{team_id}/logins").get(),
+        "reflections": storage.reference(f"reflections/{team_id}").get(),
+        "pr_index": storage.reference(f"indexes/github/pull_request/{team_id}").get(),
+        "sync_state": storage.reference(f"sync_state/{team_id}").get(),
+    }
+
+def isolation_problems(team: Dict[str, str], repo: Dict[str, Any], data: Dict[str, Any]) -> List[str]:
+    """Records in the team's slice that can't have come from the team's own repository."""
+    problems = []
+    shas = {c["sha"] for commits in repo["commits"].values() for c in commits}
+    people = {p.replace(".", "_") for p in synthetic.authors(team["owner"])}
+    logins = {p.split("@")[0] for p in synthetic.authors(team["owner"])}
+    for cid, c in data["contributions"].items():
+        if c.get("team_id") != team["team_id"]:
+            problems.append(f"contribution {cid} has team_id {c.get('team_id')}")
+    for cid, commit in data["commits"].items():
+        if not commit or commit.get("sha") not in shas:
+            problems.append(f"commit {cid} is not from {team['owner']}/{team['repo']}")
+        elif commit.get("login") not in people:
+            problems.append(f"commit {cid} has author {commit.get('login')}")
+    prs = ((data["team_log_data"] or {}).get("github") or {}).get("pull_request") or {}
+    if len(prs) != len(repo["pulls"]):
+        problems.append(f"{len(prs)} PRs stored, repository has {len(repo['pulls'])}")
+    for cid, pr in prs.items():
+        if pr.get("login") not in logins or not pr.get("url", "").startswith(f"https://github.com/{team['owner']}/"):
+            problems.append(f"PR {cid} is not from {team['owner']}/{team['repo']}")
+    if len(data["commits"]) != len(shas):
+        problems.append(f"{len(data['commits'])} commits stored, repository has {len(shas)}")
+    return problems
+
+async def sync_sequentially(teams: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    from scripts.fetch_github_data import fetch_data_async
+    from scripts.post_github_data import post_to_db
+    from scripts.sync_state import save_github_marks
+
+    reference = {}
+    for team in teams:
+        marks = {}
+        commit_data, pr_data = await fetch_data_async(team["owner"], team["repo"], False, False, os.environ["GITHUB_TOKEN"], marks)
+        await asyncio.to_thread(post_to_db, commit_data, pr_data, team["team_id"])
+        await asyncio.to_thread(save_github_marks, team["team_id"], team["owner"], team["repo"], marks)
+        reference[team["team_id"]] = team_slice(team["team_id"])
+    return reference
+
+async def sync_concurrently(base_url: str, teams: List[Dict[str, str]], timeout: float = 300) -> Dict[str, Any]:
+    """Queue every team's sync at once through the API and wait for all of them."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        responses = await asyncio.gather(*[
+            client.post("/api/github/post", params={"team_id": t["team_id"], "owner": t["owner"], "repo_name": t["repo"]})
+            for t in teams
+        ])
+        job_ids = {t["team_id"]: r.json()["job_id"] for t, r in zip(teams, responses)}
+        deadline = time.monotonic() + timeout
+        jobs = {}
+        while len(jobs) < len(job_ids):
+            if time.monotonic() > deadline:
+                raise RuntimeError("Timed out waiting for the sync jobs")
+            for team_id, job_id in job_ids.items():
+                if team_id not in jobs:
+                    job = (await client.get(f"/api/jobs/{job_id}")).json()
+                    if job["status"] in ("succeeded", "failed"):
+                        jobs[team_id] = job
+            await asyncio.sleep(0.05)
+    return jobs
+
+def run(teams_count: int, rounds: int, cfg: Dict[str, Any], quiet: bool = True) -> List[str]:
+    teams = [_team(i) for i in range(teams_count)]
+    repos = {
+        f"{t['owner']}/{t['repo']}": synthetic.github_repo(t["owner"], t["repo"], cfg["branches"], cfg["commits"], cfg["prs"],
+                                                            cfg["comments"], seed=i)
+        for i, t in enumerate(teams)
+    }
+    github_app = mock_github.create_app(repos, latency=cfg["github_latency_ms"] / 1000)
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir, harness.serve(github_app, lifespan="off") as github_url:
+        _configure_environment(workdir, github_url, teams_count, quiet)
+        import main
+        from scripts import storage
+
+        started = time.perf_counter()
+        reference = asyncio.run(sync_sequentially(teams))
+        sequential = time.perf_counter() - started
+        for team in teams:
+            failures += [f"{team['team_id']} (sequential): {p}" for p in
+                         isolation_problems(team, repos[f"{team['owner']}/{team['repo']}"], reference[team["team_id"]])]
+
+        with harness.serve(main.app) as app_url:
+            for round_number in range(1, rounds + 1):
+                storage.reset()
+                started = time.perf_counter()
+                jobs = asyncio.run(sync_concurrently(app_url, teams))
+                elapsed = time.perf_counter() - started
+                for team in teams:
+                    team_id = team["team_id"]
+                    if jobs[team_id]["status"] != "succeeded":
+                        failures.append(f"{team_id} (round {round_number}): job {jobs[team_id]['status']}: {jobs[team_id].get('error')}")
+                        continue
+                    data = team_slice(team_id)
+                    failures += [f"{team_id} (round {round_number}): {p}" for p in
+                                 isolation_problems(team, repos[f"{team['owner']}/{team['repo']}"], data)]
+                    for part, expected in reference[team_id].items():
+                        if json.dumps(data[part], sort_keys=True) != json.dumps(expected, sort_keys=True):
+                            failures.append(f"{team_id} (round {round_number}): {part} differs from the sequential sync")
+                print(f"round {round_number}: {teams_count} concurrent syncs in {elapsed:.2f}s "
+                      f"(sequential: {sequential:.2f}s)", file=sys.stderr)
+    return failures
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Concurrent GitHub sync isolation check")
+    parser.add_argument("--teams", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--branches", type=int, default=3)
+    parser.add_argument("--commits", type=int, default=120)
+    parser.add_argument("--prs", type=int, default=15)
+    parser.add_argument("--comments", type=int, default=3)
+    parser.add_argument("--github-latency-ms", type=float, default=10, dest="github_latency_ms")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's info-level logging")
+    args = parser.parse_args(argv)
+
+    cfg = {k: getattr(args, k) for k in ("branches", "commits", "prs", "comments", "github_latency_ms")}
+    failures = run(args.teams, args.rounds, cfg, quiet=not args.verbose)
+    if failures:
+        print(f"{len(failures)} problem(s):\n  " + "\n  ".join(failures[:50]))
+        sys.exit(1)
+    print(f"ok: {args.teams} teams x {args.rounds} round(s) of concurrent syncs matched their sequential results")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import hashlib
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+# Seeded synthetic inputs for the benchmarks: GitHub repositories in the REST API's shapes
+# (served by benchmarks/mock_github.py) and Google Docs exports in the shape
+# post_docs_data.process_docs_revisions reads. The same arguments always produce the same data.
+
+WORDS = ["the", "team", "report", "draft", "section", "results", "method", "we", "analysis", "data", "figure", "—", "it's"]
+START = datetime(2024, 9, 1, tzinfo=timezone.utc)
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _sha(*parts) -> str:
+    return hashlib.sha1("/".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+def authors(team: str, count: int = 5) -> List[str]:
+    return [f"{team}-student{i}@example.edu" for i in range(count)]
+
+def github_repo(owner: str, name: str, branches: int = 3, commits: int = 200, prs: int = 30,
+                comments: int = 4, files_per_commit: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """
+    A repository as the mock server needs it:
+      branches: [{"name", "commit": {"sha"}}]
+      commits: {branch: [commit list item, newest first]}
+      commit_details: {sha: {"sha", "files": [...]}}
+      pulls: [pull list item, most recently updated first]
+      issue_comments / review_comments: {pr_number: [comment]}
+    `commits` are spread over main and the other branches; every branch also carries the first
+    tenth of main's history, so the same SHAs are listed on several branches as in real repos.
+    """
+    rng = random.Random(f"{owner}/{name}/{seed}")
+    people = authors(owner)
+    logins = [p.split("@")[0] for p in people]
+    branch_names = ["main"] + [f"feature-{i}" for i in range(1, branches)]
+
+    def make_commit(i: int, branch: str) -> Dict[str, Any]:
+        sha = _sha(owner, name, branch, i)
+        when = _iso(START + timedelta(minutes=17 * i))
+        author = rng.choice(people)
+        return {
+            "sha": sha,
+            "html_url": f"https://github.com/{owner}/{name}/commit/{sha}",
+            "commit": {
+                "author": {"name": author.split("@")[0], "email": author, "date": when},
+                "committer": {"name": author.split("@")[0], "email": author, "date": when},
+                "message": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))),
+            },
+        }
+
+    per_branch = max(1, commits // len(branch_names))
+    main_history = [make_commit(i, "main") for i in range(per_branch)]
+    shared = main_history[:max(1, per_branch // 10)]
+    history = {"main": main_history}
+    for b, branch in enumerate(branch_names[1:], start=1):
+        history[branch] = shared + [make_commit(per_branch * b + i, branch) for i in range(per_branch)]
+
+    commit_details = {}
+    for branch_commits in history.values():
+        for c in branch_commits:
+            files = []
+            for f in range(rng.randint(1, files_per_commit)):
+                additions, deletions = rng.randint(0, 80), rng.randint(0, 40)
+                files.append({"filename": f"src/module_{f}.py", "additions": additions,
+                              "deletions": deletions, "changes": additions + deletions})
+            commit_details[c["sha"]] = {"sha": c["sha"], "files": files}
+
+    pulls, issue_comments, review_comments = [], {}, {}
+    for n in range(1, prs + 1):
+        created = START + timedelta(hours=5 * n)
+        updated = created + timedelta(hours=rng.randint(1, 48))
+        merged = rng.random() < 0.6
+        pulls.append({
+            "number": n,
+            "html_url": f"https://github.com/{owner}/{name}/pull/{n}",
+            "diff_url": f"https://github.com/{owner}/{name}/pull/{n}.diff",
+            "title": f"PR {n}: " + " ".join(rng.choice(WORDS) for _ in range(4)),
+            "body": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))),
+            "user": {"login": rng.choice(logins)},
+            "created_at": _iso(created),
+            "updated_at": _iso(updated),
+            "merged_at": _iso(updated) if merged else None,
+            "closed_at": _iso(updated) if merged else None,
+            "merge_commit_sha": _sha(owner, name, "merge", n) if merged else None,
+            "state": "closed" if merged else "open",
+        })
+        for kind, store, count in (("issue", issue_comments, comments), ("review", review_comments, comments // 2)):
+            store[n] = [{
+                "id": int(_sha(owner, name, kind, n, c)[:8], 16),
+                "user": {"login": rng.choice(logins)},
+                "body": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 20))),
+                "created_at": _iso(created + timedelta(minutes=30 * (c + 1))),
+            } for c in range(count)]
+    pulls.sort(key=lambda pr: pr["updated_at"], reverse=True)
+
+    return {
+        "branches": [{"name": b, "commit": {"sha": history[b][-1]["sha"]}} for b in branch_names],
+        # GitHub lists a branch's commits newest first
+        "commits": {b: list(reversed(cs)) for b, cs in history.items()},
+        "commit_details": commit_details,
+        "pulls": pulls,
+        "issue_comments": issue_comments,
+        "review_comments": review_comments,
+    }
+
+def docs_export(blocks: int = 1000, threads: int = 20, file_id: str = "bench-file", team: str = "bench", seed: int = 0) -> Dict[str, Any]:
+    """A Google Docs export: `blocks` revision blocks by the team's authors, plus comment threads."""
+    rng = random.Random(f"{file_id}/{seed}")
+    people = authors(team)
+    start = START.timestamp()
+    return {
+        "file": {"id": file_id, "name": f"Document {file_id}", "url": ""},
+        "revision": {"blocks": [
+            {
+                "author": rng.choice(people),
+                # Bursts of edits share a second, as real exports do
+                "timestamp": datetime.fromtimestamp(start + i // 3, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+                "type": rng.choice(["insert", "deletion", "insert_tile"]),
+                "finalText": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 120))),
+            }
+            for i in range(blocks)
+        ]},
+        "comments": {"threads": [
+            {
+                "id": f"{file_id}-thread-{t}",
+                "authorEmail": rng.choice(people),
+                "createdTime": _iso(START + timedelta(minutes=40 * t)),
+                "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 30))),
+                "quoted": "",
+                "attribution": {"author": rng.choice(people)},
+            }
+            for t in range(threads)
+        ]},
+    }
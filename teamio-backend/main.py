@@ -1,25 +1,77 @@
 from fastapi import FastAPI, Request, Response, Query
-from fastapi.responses import JSONResponse
-import firebase_admin
-from firebase_admin import credentials, db
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import UploadFile, File, Form, HTTPException
 from pydantic import BaseModel
 import uuid
 import os
-from typing import Dict, Any, List
-from firebase_admin import db
-import traceback
+import io
+import hashlib
+import zipfile
+from typing import List
 import json
 from collections import defaultdict
 import asyncio
+import logging
 from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 
-# Load environment variables from .env file
+# Load environment variables from .env file (before the scripts read their settings)
 load_dotenv()
 
-app = FastAPI()
+from scripts import jobs, reflection_aggregates, contributions_query, team_cache, json_stream, revision_compaction, storage, metrics
+from scripts import fetch_github_data as github_rest, fetch_github_graphql as github_graphql
+from scripts.sync_state import load_github_marks, save_github_marks
+from scripts.post_github_data import post_to_db
+from scripts.post_docs_data import post_docs_to_db, post_docs_file_to_db, post_docs_files_to_db
+
+# LOG_LEVEL=DEBUG also logs the payloads and user mappings the handlers work with
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO; the GitHub syncs make thousands
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Startup only registers the job handlers and starts the workers, so the process accepts connections
+# within milliseconds. Connecting storage (Firebase) and GitHub happens in a background warmup;
+# GET /api/ready answers 503 until it has finished. Requests that arrive earlier still work:
+# storage.reference() initializes on first use.
+readiness = {"ready": False, "storage": "pending", "github": "pending"}
+
+async def warm_up():
+    try:
+        await run_in_threadpool(storage.warm)
+        readiness["storage"] = "ok"
+        readiness["ready"] = True
+        logger.info("Storage initialized successfully (%s)", storage.BACKEND)
+    except Exception as e:
+        readiness["storage"] = f"error: {e}"
+        logger.error("Storage initialization failed: %s", e)
+    try:
+        await github_rest.open_shared_client()
+        readiness["github"] = "ok"
+    except Exception as e:
+        # Not fatal: syncs open connections on demand
+        readiness["github"] = f"unreachable: {e}"
+        logger.warning("GitHub connection warmup failed: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    jobs.register_handler("github_sync", run_github_sync)
+    jobs.register_handler("google_docs_ingest", run_docs_ingest)
+    jobs.register_handler("google_docs_upload", run_docs_upload)
+    jobs.register_handler("google_docs_bulk", run_docs_bulk)
+    jobs.start_workers()
+    warmup = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+        await jobs.stop_workers()
+        await github_rest.close_shared_client()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Adjust this to restrict origins in production
@@ -27,65 +79,181 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it's outermost: its timings and Server-Timing header cover the whole request
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Initialize Firebase with error handling
-try:
-    cred = credentials.Certificate("TEAMIO_FIREBASE_SERVICE_CREDENTIALS.json")
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': 'https://teamio-test-default-rtdb.firebaseio.com'
-    })
-    print("Firebase initialized successfully")
-except Exception as e:
-    print(f"Firebase initialization failed: {e}")
-    raise
+# Summary: Readiness probe for load balancers / autoscalers.
+# Returns: 200 once storage is connected (the GitHub warmup isn't waited for), otherwise 503.
+@app.get("/api/ready")
+async def get_ready():
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
 
-# Summary: Fetch GitHub data for a given owner and repo, then post it to Firebase under a specific team.
-# Request body example: {"owner": "octocat", "repo_name": "Hello-World", "team_id": "your_team_id"}
-# Returns: Success message or error.
+# Summary: Queue a sync of GitHub data for a given owner and repo into a specific team.
+# Query params example: ?team_id=your_team_id&owner=octocat&repo_name=Hello-World
+# Returns: 202 with a job id; poll GET /api/jobs/{job_id} for progress and the result.
+# A second request with the same parameters while that sync is still queued or running returns the same job id.
 
 class GitHubDataRequest(BaseModel):
     repo_owner: str
     repo_name: str
     team_id: str
 
+# Pass incremental=true to only fetch commits/PRs newer than the team's last sync of this repository (see scripts/sync_state.py).
+# Pass api=graphql to fetch through the GitHub GraphQL API in bulk pages instead of per-commit/per-PR REST calls.
 @app.post("/api/github/post")
-async def fetch_github_data(team_id: str = Query(...), owner: str = Query(...), repo_name: str = Query(...), main_branch_only: bool = Query(False), merged_prs_only: bool = Query(False)):
+async def fetch_github_data(team_id: str = Query(...), owner: str = Query(...), repo_name: str = Query(...), main_branch_only: bool = Query(False), merged_prs_only: bool = Query(False), incremental: bool = Query(False), api: str = Query("rest", pattern="^(rest|graphql)$")):
     try:
-        from scripts.fetch_github_data import fetch_data
-        GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-        print(f"GitHub token loaded: {GITHUB_TOKEN[:10]}..." if GITHUB_TOKEN else "No token found!")
-
-        commit_data, pr_data = await run_in_threadpool(fetch_data, owner, repo_name, main_branch_only, merged_prs_only, GITHUB_TOKEN)
-
-        from scripts.post_github_data import post_to_db
-        print("Commit data:", commit_data)
-        print("PR data:", pr_data)
-        await run_in_threadpool(post_to_db, commit_data, pr_data, team_id)
+        params = {
+            "team_id": team_id,
+            "owner": owner,
+            "repo_name": repo_name,
+            "main_branch_only": main_branch_only,
+            "merged_prs_only": merged_prs_only,
+            "incremental": incremental,
+            "api": api,
+        }
+        job_id, coalesced = await run_in_threadpool(jobs.enqueue, "github_sync", team_id, params, github_sync_key(params))
+        job = await run_in_threadpool(jobs.get_job, job_id)
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"], "coalesced": coalesced})
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Failed to queue GitHub sync for team %s", team_id)
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+def github_sync_key(params: dict) -> str:
+    """Dedupe key for a GitHub sync: the team plus everything that changes what the sync fetches."""
+    # GitHub owner and repository names are case-insensitive
+    return (f"github:{params['team_id']}:{params['owner'].lower()}/{params['repo_name'].lower()}:"
+            f"main_branch_only={params['main_branch_only']}:merged_prs_only={params['merged_prs_only']}:"
+            f"incremental={params['incremental']}:api={params['api']}")
+
+async def run_github_sync(job_id: str, params: dict):
+    team_id = params["team_id"]
+    fetch_data_async = github_graphql.fetch_data_graphql_async if params.get("api") == "graphql" else github_rest.fetch_data_async
+    GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+    if not GITHUB_TOKEN:
+        logger.warning("No GitHub token found; syncing %s/%s unauthenticated", params["owner"], params["repo_name"])
+
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "fetching"})
+    # A full sync still records marks so the next incremental sync has a starting point
+    marks = await run_in_threadpool(load_github_marks, team_id, params["owner"], params["repo_name"]) if params.get("incremental") else {}
+    incomplete = []
+    commit_data, pr_data = await fetch_data_async(
+        params["owner"], params["repo_name"], params.get("main_branch_only", False), params.get("merged_prs_only", False),
+        GITHUB_TOKEN, marks, incomplete
+    )
+    await run_in_threadpool(jobs.update_progress, job_id, {
+        "stage": "writing",
+        "branches_fetched": len({c["branch"] for c in commit_data}),
+        "commits_fetched": len(commit_data),
+        "prs_fetched": len(pr_data),
+    })
+
+    logger.info("Writing %d commits and %d PRs for team %s", len(commit_data), len(pr_data), team_id)
+    logger.debug("Commit data: %s", commit_data)
+    logger.debug("PR data: %s", pr_data)
+    written = await run_in_threadpool(post_to_db, commit_data, pr_data, team_id)
+    # Only advance the marks once everything they cover has been written;
+    # after a partial fetch the next incremental sync picks the missing records up again
+    if not incomplete:
+        await run_in_threadpool(save_github_marks, team_id, params["owner"], params["repo_name"], marks)
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "done", **written})
+    return {
+        "message": "GitHub data posted" if not incomplete else "GitHub data partially posted",
+        "commits": len(commit_data),
+        "pull_requests": len(pr_data),
+        "incomplete": incomplete,
+    }
+
+# Summary: Hit/miss/invalidation counters and current size of the team read cache (see scripts/team_cache.py).
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return JSONResponse(content=team_cache.stats())
+
+# Summary: Report the status, progress counters and result of a queued ingestion job.
+# Returns: Job object or 404 if not found.
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await run_in_threadpool(jobs.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job)
+
+# Summary: Prometheus text exposition of request, database and GitHub API metrics (see scripts/metrics.py).
+@app.get("/metrics")
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Summary: Fetch contributions for a team as a list, sorted by timestamp descending.
 # Request body example: {"team_id": "your_team_id"}
 # Returns: List of contribution objects, sorted by timestamp descending.
 
 # replace your current GET handler
 @app.get("/api/contributions/all")
-async def get_contributions(team_id: str = Query(...)):
+async def get_contributions(
+    team_id: str = Query(...),
+    tool: str = Query(None),
+    metric: str = Query(None),
+    author: str = Query(None),
+    start: str = Query(None, description="Earliest timestamp (inclusive, ISO 8601)"),
+    end: str = Query(None, description="Latest timestamp (inclusive, ISO 8601)"),
+    limit: int = Query(None, ge=1),
+    cursor: str = Query(None),
+    fields: str = Query(None, description="Comma-separated keys to return, e.g. contribution_id,author,timestamp,title"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
     try:
-        ref = db.reference(f'contributions/{team_id}')
-        raw_data = ref.get()
-        contributions = list(raw_data.values()) if raw_data else []
-        contributions.sort(key=lambda x: x['timestamp'], reverse=True)
-        return JSONResponse(content=contributions)
+        projection = json_stream.parse_fields(fields)
+        if format == "ndjson":
+            return await stream_contributions(team_id, (tool, metric, author, start, end), limit, cursor, projection)
+
+        if limit is not None and limit > contributions_query.MAX_LIMIT:
+            return JSONResponse(status_code=400, content={"error": f"limit must be at most {contributions_query.MAX_LIMIT}"})
+        params = (tool, metric, author, start, end, limit, cursor)
+        contributions, next_cursor = await run_in_threadpool(
+            team_cache.get_or_load, team_id, ("contributions",) + params,
+            lambda: contributions_query.query_contributions(team_id, *params)
+        )
+        contributions = [json_stream.project(c, projection) for c in contributions]
+        if limit is None:
+            # Unpaged callers get the full (filtered) list, as before
+            return Response(content=json_stream.dumps(contributions), media_type="application/json")
+        return Response(content=json_stream.dumps({"items": contributions, "next_cursor": next_cursor}), media_type="application/json")
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+async def stream_contributions(team_id: str, filters: tuple, limit: int, cursor: str, projection):
+    """
+    NDJSON, one contribution per line, newest first. Rows are read a page at a time,
+    so memory stays bounded by the page size however large the team's history is.
+    `limit` caps the total number of rows streamed. Not served from team_cache.
+    """
+    def next_page(page_cursor, remaining):
+        page_size = contributions_query.MAX_LIMIT if remaining is None else min(remaining, contributions_query.MAX_LIMIT)
+        return contributions_query.query_contributions(team_id, *filters, page_size, page_cursor)
+
+    # Read the first page before responding, so a bad cursor is still a 400
+    first_page = await run_in_threadpool(next_page, cursor, limit)
+
+    async def body():
+        page, page_cursor = first_page
+        remaining = limit
+        while True:
+            for line in json_stream.ndjson_lines(page, projection):
+                yield line
+            if remaining is not None:
+                remaining -= len(page)
+            if not page_cursor or remaining == 0:
+                break
+            page, page_cursor = await run_in_threadpool(next_page, page_cursor, remaining)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 @app.get("/api/teams/map-logins")
 async def get_team_logins(team_id: str = Query(...)):
     try:
-        ref = db.reference(f'teams/{team_id}/logins')
-        logins_data = ref.get() or {}
+        logins_data = await run_in_threadpool(team_cache.read, team_id, f'teams/{team_id}/logins') or {}
         # Convert to array format expected by frontend
         logins = list(logins_data.keys())
         return JSONResponse(content=logins)
@@ -95,8 +263,7 @@ async def get_team_logins(team_id: str = Query(...)):
 @app.get("/api/teams/mapped-users")
 async def get_mapped_users(team_id: str = Query(...)):
     try:
-        ref = db.reference(f'teams/{team_id}/logins')
-        logins_data = ref.get() or {}
+        logins_data = await run_in_threadpool(team_cache.read, team_id, f'teams/{team_id}/logins') or {}
         # Return the mapping of logins to net_ids
         mapped_users = {}
         for login_key, login_info in logins_data.items():
@@ -119,54 +286,50 @@ async def update_team_logins(team_id: str = Query(...), request: Request = None)
             return JSONResponse(status_code=400, content={"error": "No mappings provided"})
         
         # Update the team logins with the mappings
-        ref = db.reference(f'teams/{team_id}/logins')
+        ref = storage.reference(f'teams/{team_id}/logins')
         updates = {}
         for login, net_id in mappings.items():
             updates[login] = {"login": login, "net_id": net_id}
         
         ref.update(updates)
+        team_cache.invalidate_team(team_id)
         return JSONResponse(content={"message": "Mappings updated successfully"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/api/reflections/commits")
 async def get_commit_summary(team_id: str = Query(...)):
-    contrib_ref = await run_in_threadpool(db.reference, f"contributions/{team_id}")
-    contributions = await run_in_threadpool(contrib_ref.get) or {}
-
     # Get mapped users from logins
-    logins_ref = await run_in_threadpool(db.reference, f"teams/{team_id}/logins")
-    logins_data = await run_in_threadpool(logins_ref.get) or {}
+    logins_data = await run_in_threadpool(team_cache.read, team_id, f"teams/{team_id}/logins") or {}
     mapped_users = {}
     for login_key, login_info in logins_data.items():
         if isinstance(login_info, dict) and 'net_id' in login_info:
             mapped_users[login_info['login']] = login_info['net_id']
-    print(f"Commits mapped_users: {mapped_users}")
+    logger.debug("Commits mapped_users: %s", mapped_users)
 
-    tasks = []
-    for contrib_id in contributions.keys():
-        task = run_in_threadpool(db.reference(f"log_data/github/commit/{contrib_id}").get)
-        tasks.append(task)
+    # Served from the materialized rows once the team's are complete (see scripts/reflection_aggregates.py)
+    if await run_in_threadpool(team_cache.read, team_id, reflection_aggregates.marker_path(team_id)):
+        aggregate_rows = await run_in_threadpool(team_cache.read, team_id, f"reflections/{team_id}/commit") or {}
+        return JSONResponse(content=reflection_aggregates.summarize_commits(aggregate_rows, mapped_users))
 
-    commit_results = await asyncio.gather(*tasks)
+    # Otherwise a single read of the team's contributions, which carry the commit metrics themselves
+    contributions = await run_in_threadpool(team_cache.read, team_id, f"contributions/{team_id}") or {}
 
     summary = {}
     timeline_map = {}
     
-    for contrib_data, commit_data in zip(contributions.values(), commit_results):
-        if commit_data:
+    for contrib_data in contributions.values():
+        if contrib_data.get("tool") == "github" and contrib_data.get("metric") == "commit":
             # Use mapped net_id if available, otherwise fall back to author
             original_author = contrib_data.get("author", "unknown")
             author = mapped_users.get(original_author, original_author)
-            print(f"GitHub timeline: {original_author} -> {author}")
             if author not in summary:
                 summary[author] =  {"commits": 0, "lines": 0}
             summary[author]["commits"] += 1
 
-            additions = commit_data.get("additions", 0)
-            #deletions = commit_data.get("deletions", 0)
-            summary[author]["lines"] += additions #+ deletions
-            timestamp = commit_data.get("timestamp")
+            additions = contrib_data.get("additions", 0)
+            summary[author]["lines"] += additions
+            timestamp = contrib_data.get("timestamp")
             size =  contrib_data.get("quantity")
             if timestamp:
                 if author not in timeline_map:
@@ -186,34 +349,31 @@ async def get_commit_summary(team_id: str = Query(...)):
 @app.get("/api/reflections/feedback")
 async def get_feedback_matrix(team_id: str = Query(...)):
     try:
-        # 1. Fetch all PRs for the team
-        pr_ref = await run_in_threadpool(db.reference, f"log_data/github/pull_request")
-        pr_data = await run_in_threadpool(pr_ref.get) or {}
-        print(f"Total PRs fetched: {len(pr_data)}")  #
-        team_data = await run_in_threadpool(db.reference(f"teams/{team_id}/logins").get) or {}
+        team_data = await run_in_threadpool(team_cache.read, team_id, f"teams/{team_id}/logins") or {}
 
         team_students = {
             login: info.get("net_id")
             for login, info in team_data.items()
             if info.get("net_id")  # only include if net_id exists
         }
-        print(f"Team students (github_login -> netid): {team_students}")
-        # 2. Prepare async tasks for fetching comments under each PR
-        tasks = []
-        pr_list = list(pr_data.items())
-        for pr_id, pr_info in pr_list:
-            comments_ref = db.reference(f"log_data/github/pull_request/{pr_id}/comments")
-            task = run_in_threadpool(comments_ref.get)
-            tasks.append(task)
-
-        # 3. Execute all comment fetches concurrently
-        comments_results = await asyncio.gather(*tasks)
-
-        # 4. Aggregate feedback counts: giver → receiver → count
+        logger.debug("Team students (github_login -> netid): %s", team_students)
+
+        # Served from the materialized rows once the team's are complete (see scripts/reflection_aggregates.py)
+        if await run_in_threadpool(team_cache.read, team_id, reflection_aggregates.marker_path(team_id)):
+            aggregate_rows = await run_in_threadpool(team_cache.read, team_id, f"reflections/{team_id}/feedback") or {}
+            return JSONResponse(content={"feedback_counts": reflection_aggregates.summarize_feedback(aggregate_rows, team_students)})
+
+        # 1. Fetch this team's PRs and Docs comments (with PR comments embedded) in one read of its partition
+        partition = await run_in_threadpool(team_cache.read, team_id, f"team_log_data/{team_id}") or {}
+        pr_data = (partition.get("github") or {}).get("pull_request") or {}
+        logger.debug("Total PRs fetched: %d", len(pr_data))
+
+        # 2. Aggregate feedback counts: giver → receiver → count
         feedback_counts = {}
 
-        for (pr_id, pr_info), comments in zip(pr_list, comments_results):
+        for pr_id, pr_info in pr_data.items():
             author = pr_info.get("login", "unknown")
+            comments = pr_info.get("comments")
             if not comments:
                 continue
             author_netid = team_students.get(author)
@@ -234,12 +394,8 @@ async def get_feedback_matrix(team_id: str = Query(...)):
 
                 feedback_counts[commenter_netid][author_netid] += len(comment_entries)  # count all comments
 
-        gdoc_comments_ref = await run_in_threadpool(
-            db.reference,
-            "log_data/google_docs/comment"
-        )
-        gdoc_comments = await run_in_threadpool(gdoc_comments_ref.get) or {}
-        print(gdoc_comments)
+        gdoc_comments = (partition.get("google_docs") or {}).get("comment") or {}
+        logger.debug("Docs comments: %s", gdoc_comments)
         for comment_id, comment_info in gdoc_comments.items():
             giver_login = comment_info.get("login")
             receiver_name = comment_info.get("comment_target_author")
@@ -268,41 +424,33 @@ async def get_feedback_matrix(team_id: str = Query(...)):
 
 @app.get("/api/reflections/revisions")
 async def get_revisions_history(team_id: str = Query(...)):
-    # 1. Make the first blocking call
-    contrib_ref = await run_in_threadpool(db.reference, f"contributions/{team_id}")
-    contributions = await run_in_threadpool(contrib_ref.get) or {}
-
     # Get mapped users from logins
-    logins_ref = await run_in_threadpool(db.reference, f"teams/{team_id}/logins")
-    logins_data = await run_in_threadpool(logins_ref.get) or {}
+    logins_data = await run_in_threadpool(team_cache.read, team_id, f"teams/{team_id}/logins") or {}
     mapped_users = {}
     for login_key, login_info in logins_data.items():
         if isinstance(login_info, dict) and 'net_id' in login_info:
             mapped_users[login_info['login']] = login_info['net_id']
-    print(f"Revisions mapped_users: {mapped_users}")
+    logger.debug("Revisions mapped_users: %s", mapped_users)
 
-    # 2. Prepare a list of asynchronous tasks
-    tasks = []
-    for contrib_id in contributions.keys():
-        task = run_in_threadpool(db.reference(f"log_data/google_docs/revision/{contrib_id}").get)
-        tasks.append(task)
+    # Served from the materialized rows once the team's are complete (see scripts/reflection_aggregates.py)
+    if await run_in_threadpool(team_cache.read, team_id, reflection_aggregates.marker_path(team_id)):
+        aggregate_rows = await run_in_threadpool(team_cache.read, team_id, f"reflections/{team_id}/revision") or {}
+        return JSONResponse(content=reflection_aggregates.summarize_revisions(aggregate_rows, mapped_users))
 
-    # 3. Execute all tasks concurrently
-    revision_results = await asyncio.gather(*tasks)
+    # Otherwise a single read of the team's contributions, filtered to revisions
+    contributions = await run_in_threadpool(team_cache.read, team_id, f"contributions/{team_id}") or {}
 
-    # 4. Process the results
     summary = {}
     timeline_map = {}
 
-    for contrib_data, revision_data in zip(contributions.values(), revision_results):
-        if revision_data:
+    for contrib_data in contributions.values():
+        if contrib_data.get("tool") == "google_docs" and contrib_data.get("metric") == "revision":
             # Use mapped net_id if available, otherwise fall back to author
             original_author = contrib_data.get("author", "unknown")
             author = mapped_users.get(original_author, original_author)
-            print(f"Google Docs timeline: {original_author} -> {author}")
             summary[author] = summary.get(author, 0) + 1
 
-            timestamp = revision_data.get("timestamp")
+            timestamp = contrib_data.get("timestamp")
             if timestamp:
                 if author not in timeline_map:
                     timeline_map[author] = []
@@ -315,45 +463,230 @@ async def get_revisions_history(team_id: str = Query(...)):
     
     return JSONResponse(content={"summary": summary, "timeline": timeline})
 
-from scripts.post_docs_data import post_docs_to_db
-from pydantic import BaseModel
-from fastapi import UploadFile, File, Form, HTTPException
-import json
-
 class DocsIngestBody(BaseModel):
     team_id: str
     doc: dict
 
+def docs_ingest_key(doc: dict, team_id: str):
+    """Dedupe key for a posted export: the document plus a digest of its contents, so an edited re-post gets its own job."""
+    file_id = (doc.get("file") or {}).get("id")
+    if not file_id:
+        return None
+    digest = hashlib.sha256(json.dumps(doc, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+    return f"google_docs:{team_id}:{file_id}:{digest}"
+
+async def enqueue_docs_ingest(doc: dict, team_id: str):
+    # Re-posting an identical export while it's still being ingested coalesces into one job
+    dedupe_key = await run_in_threadpool(docs_ingest_key, doc, team_id)
+    job_id, coalesced = await run_in_threadpool(jobs.enqueue, "google_docs_ingest", team_id, {"team_id": team_id, "doc": doc}, dedupe_key)
+    job = await run_in_threadpool(jobs.get_job, job_id)
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"], "coalesced": coalesced})
+
+async def run_docs_ingest(job_id: str, params: dict):
+    logger.info("Posting Google Docs data for team: %s", params["team_id"])
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "writing"})
+    counts = await run_in_threadpool(post_docs_to_db, params["doc"], params["team_id"])
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "done", **counts})
+    return {"message": "Google Docs data posted", **counts}
+
+# Returns: 202 with a job id; poll GET /api/jobs/{job_id} for progress and the result.
 @app.post("/api/google_docs/post")
 async def post_google_docs_json(body: DocsIngestBody):
     try:
-        print("Posting Google Docs data for team:", body.team_id)
-        await run_in_threadpool(post_docs_to_db, body.doc, body.team_id)
-        return {"message": "Google Docs data posted"}
+        return await enqueue_docs_ingest(body.doc, body.team_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Uploaded exports wait here until their ingest job has run
+DOCS_UPLOAD_DIR = os.getenv("DOCS_UPLOAD_DIR", "docs_uploads")
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+def _copy_to_upload_dir(src, suffix=".json") -> tuple:
+    """Copy a file object to DOCS_UPLOAD_DIR in chunks. Returns (path, sha256 hex digest)."""
+    os.makedirs(DOCS_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(DOCS_UPLOAD_DIR, f"{uuid.uuid4()}{suffix}")
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        while True:
+            chunk = src.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return path, digest.hexdigest()
+
+def _check_json_object(path: str):
+    with open(path, "rb") as f:
+        head = f.read(64).lstrip(b"\xef\xbb\xbf \t\r\n")
+    if not head.startswith(b"{"):
+        os.remove(path)
+        raise ValueError("expected a JSON object")
+
+def save_docs_upload(upload) -> tuple:
+    """Copy an uploaded export to DOCS_UPLOAD_DIR. Returns (path, sha256 hex digest)."""
+    path, digest = _copy_to_upload_dir(upload)
+    _check_json_object(path)
+    return path, digest
+
+async def run_docs_upload(job_id: str, params: dict):
+    logger.info("Posting uploaded Google Docs export for team: %s", params["team_id"])
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "writing"})
+    try:
+        counts = await run_in_threadpool(
+            post_docs_file_to_db, params["path"], params["team_id"],
+            lambda counts: jobs.update_progress(job_id, counts)
+        )
+    finally:
+        if os.path.exists(params["path"]):
+            os.remove(params["path"])
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "done", **counts})
+    return {"message": "Google Docs data posted", **counts}
+
+# Returns: 202 with a job id. The export is saved to disk and parsed incrementally by the job,
+# so neither the request nor the event loop ever holds the whole document.
 @app.post("/api/google_docs/upload")
 async def upload_google_docs_file(team_id: str = Form(...), file: UploadFile = File(...)):
     try:
-        raw = await file.read()
-        doc_json = json.loads(raw.decode("utf-8"))
-        post_docs_to_db(doc_json, team_id)
-        return {"message": "Google Docs data posted (file upload)"}
+        path, digest = await run_in_threadpool(save_docs_upload, file.file)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+    # Re-uploading the same export while it's still being ingested coalesces into one job
+    job_id, coalesced = await run_in_threadpool(
+        jobs.enqueue, "google_docs_upload", team_id, {"team_id": team_id, "path": path},
+        f"google_docs_upload:{team_id}:{digest}"
+    )
+    if coalesced:
+        os.remove(path)
+    job = await run_in_threadpool(jobs.get_job, job_id)
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"], "coalesced": coalesced})
+
+class BulkDocsIngestBody(BaseModel):
+    team_id: str
+    docs: List[dict]
+
+def save_bulk_docs_upload(upload, filename: str) -> tuple:
+    """
+    Save one file of a bulk upload: a JSON export, or a .zip of them.
+    Returns ([{"path", "name"}], sha256 hex digest of the uploaded bytes).
+    """
+    path, digest = _copy_to_upload_dir(upload, suffix=".upload")
+    if not zipfile.is_zipfile(path):
+        _check_json_object(path)
+        return [{"path": path, "name": filename}], digest
+    saved = []
+    try:
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(".json"):
+                    continue
+                with archive.open(member) as src:
+                    member_path, _ = _copy_to_upload_dir(src)
+                saved.append({"path": member_path, "name": f"{filename}/{member.filename}"})
+    except Exception:
+        for f in saved:
+            os.remove(f["path"])
+        raise
+    finally:
+        os.remove(path)
+    return saved, digest
+
+def save_bulk_docs_json(docs: List[dict]) -> tuple:
+    saved = []
+    digest = hashlib.sha256()
+    for i, doc in enumerate(docs):
+        raw = json.dumps(doc).encode("utf-8")
+        digest.update(hashlib.sha256(raw).digest())
+        path, _ = _copy_to_upload_dir(io.BytesIO(raw))
+        saved.append({"path": path, "name": (doc.get("file") or {}).get("name") or f"doc {i}"})
+    return saved, digest.hexdigest()
+
+async def enqueue_docs_bulk(files: List[dict], digest: str, team_id: str):
+    # The same set of documents submitted again while it's still being ingested coalesces into one job
+    job_id, coalesced = await run_in_threadpool(
+        jobs.enqueue, "google_docs_bulk", team_id, {"team_id": team_id, "files": files},
+        f"google_docs_bulk:{team_id}:{digest}"
+    )
+    if coalesced:
+        for f in files:
+            os.remove(f["path"])
+    job = await run_in_threadpool(jobs.get_job, job_id)
+    return JSONResponse(status_code=202, content={
+        "job_id": job_id, "status": job["status"], "coalesced": coalesced, "documents": len(files)
+    })
+
+async def run_docs_bulk(job_id: str, params: dict):
+    files = params["files"]
+    logger.info("Posting %d Google Docs export(s) for team: %s", len(files), params["team_id"])
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "writing", "documents": len(files)})
+    try:
+        result = await run_in_threadpool(
+            post_docs_files_to_db, files, params["team_id"],
+            lambda counts: jobs.update_progress(job_id, counts)
+        )
+    finally:
+        for f in files:
+            if os.path.exists(f["path"]):
+                os.remove(f["path"])
+    await run_in_threadpool(jobs.update_progress, job_id, {"stage": "done", **result})
+    return {"message": "Google Docs data posted", **result}
+
+# Many documents in one request, as a JSON body: {"team_id": ..., "docs": [doc, ...]}.
+# Returns: 202 with a job id; the documents are processed in parallel across worker processes.
+@app.post("/api/google_docs/bulk")
+async def post_google_docs_bulk(body: BulkDocsIngestBody):
+    if not body.docs:
+        raise HTTPException(status_code=400, detail="No documents provided")
+    files, digest = await run_in_threadpool(save_bulk_docs_json, body.docs)
+    return await enqueue_docs_bulk(files, digest, body.team_id)
+
+# Many documents as multipart files: JSON exports and/or .zip archives of them.
+@app.post("/api/google_docs/bulk_upload")
+async def upload_google_docs_bulk(team_id: str = Form(...), files: List[UploadFile] = File(...)):
+    saved = []
+    digest = hashlib.sha256()
+    try:
+        for upload in files:
+            file_entries, file_digest = await run_in_threadpool(save_bulk_docs_upload, upload.file, upload.filename or "upload")
+            saved.extend(file_entries)
+            digest.update(bytes.fromhex(file_digest))
     except Exception as e:
+        for f in saved:
+            os.remove(f["path"])
         raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+    if not saved:
+        raise HTTPException(status_code=400, detail="No Google Docs exports found in upload")
+    return await enqueue_docs_bulk(saved, digest.hexdigest(), team_id)
 
 # Summary: Fetch detailed log_data record by tool/metric/contribution_id.
 # Query params example: ?tool=google_docs&metric=revision&contribution_id=UUID
-# Returns: Full log_data object or 404 if not found.
+# Returns: Full log_data object (or just the keys listed in `fields=`) or 404 if not found.
 @app.get("/api/log_data")
-async def get_log_data(tool: str, metric: str, contribution_id: str):
+async def get_log_data(tool: str, metric: str, contribution_id: str, fields: str = Query(None)):
     try:
-        ref = db.reference(f'log_data/{tool}/{metric}/{contribution_id}')
-        data = ref.get()
-        if not data:
-            raise HTTPException(status_code=404, detail="Log data not found")
-        return data
+        ref = storage.reference(f'log_data/{tool}/{metric}/{contribution_id}')
+        projection = json_stream.parse_fields(fields)
+        if projection is None:
+            data = await run_in_threadpool(ref.get)
+            if not data:
+                raise HTTPException(status_code=404, detail="Log data not found")
+        else:
+            # Read only the requested children, so large revision `text` blobs aren't downloaded unless asked for
+            present = await run_in_threadpool(ref.get, shallow=True)
+            if not present or not isinstance(present, dict):
+                raise HTTPException(status_code=404, detail="Log data not found")
+            wanted = [f for f in projection if f in present]
+            if "text" in projection and "text" not in present and "text_delta" in present:
+                wanted.append("text_delta")
+            values = await asyncio.gather(*[run_in_threadpool(ref.child(f).get) for f in wanted])
+            data = dict(zip(wanted, values))
+        if tool == "google_docs" and metric == "revision" and "text_delta" in data and (projection is None or "text" in projection):
+            # Compacted revisions store an edit against the previous revision; rebuild the full text
+            data["text"] = await run_in_threadpool(
+                revision_compaction.reconstruct_text, data,
+                lambda cid, field: storage.reference(f'log_data/google_docs/revision/{cid}/{field}').get()
+            )
+            del data["text_delta"]
+        return Response(content=json_stream.dumps(data), media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
@@ -382,7 +715,7 @@ async def get_commits_for_reflections(team_id: str):
             net_ids_to_logins[net_id].append(login)
 
         # Fetch all contributions once
-        contrib_ref = db.reference(f'contributions/{team_id}')
+        contrib_ref = storage.reference(f'contributions/{team_id}')
         contributions = await run_in_threadpool(contrib_ref.get) or {}
         
         for contrib_id, contrib_data in contributions.items():
@@ -397,7 +730,7 @@ async def get_commits_for_reflections(team_id: str):
         # --- Stage 2: Batch-update team logins and contributions ---
         update_tasks = []
         if team_logins_update:
-            team_ref = db.reference(f'teams/{team_id}/logins')
+            team_ref = storage.reference(f'teams/{team_id}/logins')
             update_tasks.append(run_in_threadpool(team_ref.update, team_logins_update))
         
         if contributions_update:
@@ -408,7 +741,7 @@ async def get_commits_for_reflections(team_id: str):
             await asyncio.gather(*update_tasks)
 
         # --- Stage 3: Fetch all required student data in parallel ---
-        students_ref = db.reference('students')
+        students_ref = storage.reference('students')
         all_net_ids_to_update = set(net_ids_to_logins.keys()) | set(net_ids_to_contributions.keys())
         
         if not all_net_ids_to_update:
@@ -0,0 +1,42 @@
+from scripts import storage
+
+# One-off backfill of the metric fields now written onto contribution records
+# (additions / lines_changed for commits, action / word_count for Docs), for data
+# ingested before they were denormalized. Safe to re-run.
+
+FIELDS = {
+    ('github', 'commit'): ('additions', 'lines_changed'),
+    ('google_docs', 'revision'): ('action', 'word_count'),
+    ('google_docs', 'comment'): ('action',),
+}
+
+def backfill_contribution_metrics():
+    try:
+        storage.init()
+
+        log_data = {
+            (tool, metric): storage.reference(f'log_data/{tool}/{metric}').get() or {}
+            for tool, metric in FIELDS
+        }
+        contributions = storage.reference('contributions').get() or {}
+
+        for team_id, team_contributions in contributions.items():
+            updates = {}
+            for contribution_id, contribution in (team_contributions or {}).items():
+                key = (contribution.get('tool'), contribution.get('metric'))
+                record = log_data.get(key, {}).get(contribution_id)
+                if not record:
+                    continue
+                for field in FIELDS[key]:
+                    if field in record and contribution.get(field) != record[field]:
+                        updates[f'{contribution_id}/{field}'] = record[field]
+            if updates:
+                storage.reference(f'contributions/{team_id}').update(updates)
+            print(f"Team {team_id}: updated {len(updates)} field(s).")
+
+        print("Contribution metrics backfill completed.")
+    except Exception as e:
+        print(f"An error occurred while backfilling contribution metrics: {e}")
+
+if __name__ == "__main__":
+    backfill_contribution_metrics()
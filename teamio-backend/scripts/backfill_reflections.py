@@ -0,0 +1,27 @@
+from scripts import storage, reflection_aggregates
+
+# Backfill of reflections/{team_id} (see scripts/reflection_aggregates.py) for every team at once,
+# reading each log_data collection a single time. Not required: the next ingestion for a team
+# backfills it too. Safe to re-run: rows are keyed by contribution id.
+
+def backfill_reflections():
+    try:
+        storage.init()
+
+        team_ids = storage.reference('contributions').get(shallow=True) or {}
+        log_data = {
+            ('github', 'commit'): storage.reference('log_data/github/commit').get() or {},
+            ('github', 'pull_request'): storage.reference('log_data/github/pull_request').get() or {},
+            ('google_docs', 'revision'): storage.reference('log_data/google_docs/revision').get() or {},
+            ('google_docs', 'comment'): storage.reference('log_data/google_docs/comment').get() or {},
+        }
+
+        for team_id in team_ids:
+            reflection_aggregates.backfill_team(team_id, log_data)
+
+        print("Reflection aggregates backfill completed.")
+    except Exception as e:
+        print(f"An error occurred while backfilling reflection aggregates: {e}")
+
+if __name__ == "__main__":
+    backfill_reflections()
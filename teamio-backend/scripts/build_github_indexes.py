@@ -0,0 +1,38 @@
+from scripts import storage
+
+# One-off backfill of the lookup indexes maintained by post_github_data.TeamWriter.batch_post_to_index,
+# for data ingested before those indexes existed.
+
+def build_github_indexes():
+    try:
+        storage.init()
+
+        # commit sha -> contribution_id (commit SHAs are global, so this index isn't team-scoped)
+        commits = storage.reference('log_data/github/commit').get() or {}
+        sha_index = {c['sha']: c['contribution_id'] for c in commits.values() if c.get('sha') and c.get('contribution_id')}
+        if sha_index:
+            storage.reference('indexes/github/commit_sha').update(sha_index)
+        print(f"Indexed {len(sha_index)} commit(s).")
+
+        # (team, pr_number) -> contribution_id. PR log records don't carry a team,
+        # so the team comes from the contributions that point at them.
+        prs = storage.reference('log_data/github/pull_request').get() or {}
+        contributions = storage.reference('contributions').get() or {}
+        pr_count = 0
+        for team_id, team_contributions in contributions.items():
+            team_index = {}
+            for contribution_id, contribution in (team_contributions or {}).items():
+                if contribution.get('metric') != 'pull_request':
+                    continue
+                pr = prs.get(contribution_id)
+                if pr and pr.get('pr_number') not in (None, ''):
+                    team_index[f"pr-{pr['pr_number']}"] = contribution_id
+            if team_index:
+                storage.reference(f'indexes/github/pull_request/{team_id}').update(team_index)
+                pr_count += len(team_index)
+        print(f"Indexed {pr_count} pull request(s).")
+    except Exception as e:
+        print(f"An error occurred while building indexes: {e}")
+
+if __name__ == "__main__":
+    build_github_indexes()
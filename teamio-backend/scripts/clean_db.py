@@ -1,16 +1,12 @@
-import firebase_admin
-from firebase_admin import credentials, db
+from scripts import storage
 
 def clean_database():
     try:
-        # Initialize Firebase Admin SDK
-        cred = credentials.Certificate("TEAMIO_FIREBASE_SERVICE_CREDENTIALS.json")  # Path to your Firebase service account JSON
-        firebase_admin.initialize_app(cred, {
-            'databaseURL': 'https://teamio-test-default-rtdb.firebaseio.com'  # Replace with your Firebase database URL
-        })
+        # Connect the configured storage backend (STORAGE_BACKEND)
+        storage.init()
 
         # Get a reference to the root of the database
-        root_ref = db.reference('/')
+        root_ref = storage.reference('/')
 
         # Delete everything in the database
         root_ref.delete()
@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+from cachetools import LRUCache
+from scripts.github_cache import CACHE_DIR
+
+# Commit stats keyed by SHA. A commit's contents never change, so entries never expire:
+# an in-memory LRU in front of a persistent on-disk tier shared by every team and repo.
+# get / put can touch the disk, so async callers run them with asyncio.to_thread.
+MEMORY_SIZE = int(os.getenv("COMMIT_STATS_CACHE_SIZE", "50000"))
+
+_memory = LRUCache(maxsize=MEMORY_SIZE)
+_lock = threading.Lock()  # cachetools caches aren't thread-safe
+
+def _entry_path(sha: str) -> str:
+    return os.path.join(CACHE_DIR, "commit_stats", sha[:2], f"{sha}.json")
+
+def get(sha: str):
+    """Return cached stats for sha, or None on a miss."""
+    if not sha:
+        return None
+    with _lock:
+        stats = _memory.get(sha)
+    if stats is not None:
+        return stats
+    try:
+        with open(_entry_path(sha), "r", encoding="utf-8") as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _memory[sha] = stats
+    return stats
+
+def get_many(shas) -> dict:
+    """{sha: stats} for the shas that are cached."""
+    found = {}
+    for sha in shas:
+        stats = get(sha)
+        if stats is not None:
+            found[sha] = stats
+    return found
+
+def put(sha: str, stats: dict):
+    if not sha:
+        return
+    with _lock:
+        _memory[sha] = stats
+    path = _entry_path(sha)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,56 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Tuple
+from scripts import storage
+
+# Per-team manifests of what each writer last stored, so re-syncing unchanged data writes nothing:
+#   content_hashes/{team_id}/github/{metric}/{contribution_id}: hash
+#   content_hashes/{team_id}/google_docs/{file_id}/{contribution_id}: hash
+# The hash covers the processed record as the writer received it; records whose hash matches
+# the manifest are dropped before any write. Manifests are updated only after the writes for
+# those records succeed, so a failed sync is retried in full next time.
+#
+# Set CONTENT_HASH_SKIP=0 to write every record regardless (e.g. after hand-editing data).
+
+ENABLED = os.getenv("CONTENT_HASH_SKIP", "1") != "0"
+
+# Fields set or overwritten by the writers themselves, left out of the hash
+_VOLATILE = {"content_hash", "team_id"}
+
+def record_hash(record: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        {k: v for k, v in record.items() if k not in _VOLATILE},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+def _sanitize(key: str) -> str:
+    return str(key).replace('.', '_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_').replace('/', '_')
+
+def manifest_path(team_id: str, tool: str, scope: str) -> str:
+    return f"content_hashes/{team_id}/{tool}/{_sanitize(scope)}"
+
+def load_manifest(path: str) -> Dict[str, str]:
+    if not ENABLED:
+        return {}
+    return storage.reference(path).get() or {}
+
+def select_changed(records: List[Dict[str, Any]], manifest: Dict[str, str]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Records that are new or differ from the manifest, each stamped with its content_hash,
+    and the manifest entries to save once they're written.
+    """
+    changed, updates = [], {}
+    for record in records:
+        digest = record_hash(record)
+        if ENABLED and manifest.get(record["contribution_id"]) == digest:
+            continue
+        record["content_hash"] = digest
+        changed.append(record)
+        updates[record["contribution_id"]] = digest
+    return changed, updates
+
+def save_manifest(path: str, updates: Dict[str, str]):
+    if updates:
+        storage.reference(path).update(updates)
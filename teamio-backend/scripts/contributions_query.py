@@ -0,0 +1,107 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from scripts import storage
+
+# Paged, newest-first reads of contributions/{team_id}.
+# The time range and page size are pushed down to RTDB via order_by_child('timestamp')
+# (indexed by ".indexOn": ["timestamp"] in database.rules.json). RTDB allows a single orderBy
+# per query, so tool / metric / author are applied to each fetched window, and the window is
+# advanced until the page is full or the range is exhausted.
+#
+# Cursors are opaque to clients: the (timestamp, contribution_id) of the last row returned.
+# Rows with equal timestamps are ordered by key, so the pair is a strict position.
+
+MAX_LIMIT = 1000
+FILTERED_BATCH_FACTOR = 4  # over-fetch per window when filtering, to fill a page in fewer reads
+
+def encode_cursor(timestamp: str, contribution_id: str) -> str:
+    raw = json.dumps([timestamp, contribution_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        timestamp, contribution_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(timestamp), str(contribution_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _matches(contribution: Dict[str, Any], tool, metric, author) -> bool:
+    return (
+        (tool is None or contribution.get("tool") == tool)
+        and (metric is None or contribution.get("metric") == metric)
+        and (author is None or contribution.get("author") == author)
+    )
+
+def _position(key: str, contribution: Dict[str, Any]):
+    return (contribution.get("timestamp") or "", key)
+
+def _fetch_window(team_id: str, start: Optional[str], end: Optional[str], limit: Optional[int]):
+    """Rows in [start, end] by timestamp (the newest `limit` of them), newest first."""
+    query = storage.reference(f"contributions/{team_id}").order_by_child("timestamp")
+    if start is not None:
+        query = query.start_at(start)
+    if end is not None:
+        query = query.end_at(end)
+    if limit is not None:
+        query = query.limit_to_last(limit)
+    raw = query.get() or {}
+    return sorted(raw.items(), key=lambda kv: _position(*kv), reverse=True)
+
+def query_contributions(
+    team_id: str,
+    tool: str = None,
+    metric: str = None,
+    author: str = None,
+    start: str = None,
+    end: str = None,
+    limit: int = None,
+    cursor: str = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Contributions matching the filters, newest first, as (rows, next_cursor).
+    With no limit, every match in the range is returned in one read and next_cursor is None.
+    """
+    filtered = tool is not None or metric is not None or author is not None
+
+    if limit is None:
+        rows = _fetch_window(team_id, start, end, None)
+        return [c for _, c in rows if _matches(c, tool, metric, author)], None
+
+    limit = min(limit, MAX_LIMIT)
+    window_end, after_key = end, None
+    if cursor:
+        cursor_ts, after_key = decode_cursor(cursor)
+        if window_end is None or cursor_ts <= window_end:
+            window_end = cursor_ts
+        else:
+            after_key = None
+
+    batch = limit * FILTERED_BATCH_FACTOR if filtered else limit
+    page = []
+    while True:
+        rows = _fetch_window(team_id, start, window_end, batch)
+        fresh = 0
+        for key, contribution in rows:
+            # end_at is inclusive; skip rows at or before the cursor position
+            if after_key is not None and _position(key, contribution) >= (window_end, after_key):
+                continue
+            fresh += 1
+            if not _matches(contribution, tool, metric, author):
+                continue
+            page.append(contribution)
+            if len(page) == limit:
+                return page, encode_cursor(*_position(key, contribution))
+
+        if len(rows) < batch:
+            return page, None
+        if fresh == 0:
+            # Every row in the window shares the cursor's timestamp and was already returned;
+            # end_at can't split on key, so widen the window to get past the tie
+            batch *= 2
+            continue
+        next_end, after_key = _position(*rows[-1])
+        if next_end == window_end:
+            # Still inside one timestamp; the next window must reach past the rows just seen
+            batch *= 2
+        window_end = next_end
@@ -0,0 +1,175 @@
+import json
+import re
+from typing import Any, Dict, Iterator, Tuple
+
+# Incremental reader for Google Docs export files (see post_docs_data.process_docs_revisions
+# for the shape). Only `file`, each `revision.blocks[i]` and each `comments.threads[i]` are
+# ever materialized; everything else is skipped by scanning, so memory stays bounded by the
+# read buffer plus one block, however long the revision history is.
+
+READ_SIZE = 1 << 20  # characters per read
+
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_DELIMITERS = frozenset(",:]} \t\r\n")
+_decoder = json.JSONDecoder()
+
+class _Reader:
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping what's already consumed. False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str):
+        if self.peek() != ch:
+            raise ValueError(f"Expected {ch!r} in Google Docs export")
+        self.pos += 1
+
+    def read_value(self) -> Any:
+        scalar = self.peek() not in '"{['
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut by the chunk boundary decodes as its prefix ("1." as 1, "-2e" as -2),
+            # so a scalar is only complete once a delimiter follows it
+            if scalar and (end == len(self.buf) or self.buf[end] not in _DELIMITERS) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _skip_string(self):
+        i = self.pos + 1  # just past the opening quote
+        while True:
+            m = _STRING_SPECIAL.search(self.buf, i)
+            if m is None or (m.group() == "\\" and m.end() >= len(self.buf)):
+                # Nothing before here is needed again, so let _fill drop it
+                self.pos = m.start() if m else len(self.buf)
+                if not self._fill():
+                    raise ValueError("Unterminated string in Google Docs export")
+                i = self.pos
+                continue
+            if m.group() == "\\":
+                i = m.end() + 1  # skip the escaped character
+                continue
+            self.pos = m.end()
+            return
+
+    def skip_value(self):
+        ch = self.peek()
+        if ch == '"':
+            self._skip_string()
+            return
+        if ch not in "{[":
+            self.read_value()  # number / true / false / null
+            return
+        depth = 0
+        while True:
+            m = _STRUCTURAL.search(self.buf, self.pos)
+            if m is None:
+                self.pos = len(self.buf)
+                if not self._fill():
+                    raise ValueError("Truncated Google Docs export")
+                continue
+            if m.group() == '"':
+                self.pos = m.start()
+                self._skip_string()
+                continue
+            self.pos = m.end()
+            depth += 1 if m.group() in "{[" else -1
+            if depth == 0:
+                return
+
+    def object_keys(self) -> Iterator[str]:
+        """Yield each key of the object at the cursor; the caller must consume its value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValueError("Expected an object key in Google Docs export")
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError("Expected ',' or '}' in Google Docs export")
+
+    def array_items(self) -> Iterator[Any]:
+        """Yield each element of the array at the cursor."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError("Expected ',' or ']' in Google Docs export")
+
+def _items_under(reader: _Reader, key: str) -> Iterator[Any]:
+    """Items of obj[key] for the object at the cursor (e.g. revision.blocks); skips the rest."""
+    if reader.peek() != "{":
+        reader.skip_value()  # null or malformed section, treated as empty
+        return
+    for k in reader.object_keys():
+        if k == key and reader.peek() == "[":
+            yield from reader.array_items()
+        else:
+            reader.skip_value()
+
+def read_file_info(path: str) -> Dict[str, Any]:
+    """The export's top-level `file` object, or {} if it has none."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        reader = _Reader(f)
+        for key in reader.object_keys():
+            if key == "file":
+                return reader.read_value() or {}
+            reader.skip_value()
+    return {}
+
+def iter_docs_items(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ('block', revision block) and ('thread', comment thread) pairs in file order."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        reader = _Reader(f)
+        for key in reader.object_keys():
+            if key == "revision":
+                for block in _items_under(reader, "blocks"):
+                    yield "block", block
+            elif key == "comments":
+                for thread in _items_under(reader, "threads"):
+                    yield "thread", thread
+            else:
+                reader.skip_value()
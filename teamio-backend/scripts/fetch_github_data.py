@@ -1,117 +1,280 @@
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import logging
+import os
+import httpx
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+from scripts import github_cache, commit_stats_cache, metrics
+from scripts.sync_state import branch_key
+from scripts.rate_limit import RateLimitScheduler
+
+logger = logging.getLogger(__name__)
 
 # Constants
-GITHUB_OWNER, GITHUB_REPO, GITHUB_TOKEN = None, None, None
-MAIN_BRANCH_ONLY, MERGED_PRS_ONLY = False, False
-headers = {}
-BASE_URL = 'https://api.github.com'
-
-def get_branches():
-    url = f"{BASE_URL}/repos/{GITHUB_OWNER}/{GITHUB_REPO}/branches"
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception("Failed to fetch branches. Status code: " + str(response.status_code))
-
-def get_commits(branch_name):
-    url = f"{BASE_URL}/repos/{GITHUB_OWNER}/{GITHUB_REPO}/commits?sha={branch_name}"
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(f"Failed to fetch commits on branch {branch_name}. Status code: {response.status_code}. Exception: {response.reason}")
-
-def get_commit_stats(commit_sha):
-    url = f"{BASE_URL}/repos/{GITHUB_OWNER}/{GITHUB_REPO}/commits/{commit_sha}"
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        file_data = data.get('files', '')
-        files = []
-        additions = 0
-        deletions = 0
-        total = 0
-        for file in file_data:
-            files.append(file['filename'])
-            additions += file['additions']
-            deletions += file['deletions']
-            total += file['changes']
-        return {
-            'files': files,
-            'additions': additions,
-            'deletions': deletions,
-            'total': total
-        }
-    return {'additions': 0, 'deletions': 0, 'total': 0, 'files': []}
+BASE_URL = os.getenv("GITHUB_API_URL", 'https://api.github.com')  # overridable for a mock server (benchmarks/mock_github.py)
+PER_PAGE = 100  # GitHub's maximum page size; the default of 30 silently truncates lists
+
+# Upper bound on in-flight requests, and on open sockets, for one sync
+MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "10"))
+REQUEST_TIMEOUT = float(os.getenv("GITHUB_REQUEST_TIMEOUT", "30"))
+
+# Process-wide pool opened by the app's lifespan (see main.py), so syncs start on warm connections.
+# Every sync on the app's event loop borrows it; elsewhere (scripts, fetch_data) each sync opens its own.
+POOL_CONNECTIONS = int(os.getenv("GITHUB_POOL_CONNECTIONS", "20"))
+_shared_client = None
+_shared_loop = None
+
+class IncompleteFetchError(Exception):
+    def __init__(self, incomplete):
+        super().__init__(f"{len(incomplete)} GitHub record(s) could not be fetched")
+        self.incomplete = incomplete
+
+def _new_client(max_connections):
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.AsyncClient(http2=True, limits=limits, timeout=REQUEST_TIMEOUT)
+
+async def open_shared_client(warm=True):
+    """Open the process-wide pool on the running loop; with warm, connect to the API ahead of the first sync."""
+    global _shared_client, _shared_loop
+    if _shared_client is None:
+        _shared_client = _new_client(POOL_CONNECTIONS)
+        _shared_loop = asyncio.get_running_loop()
+    if warm:
+        # /rate_limit doesn't count against the rate limit
+        await _shared_client.get(f"{BASE_URL}/rate_limit")
+
+async def close_shared_client():
+    global _shared_client, _shared_loop
+    if _shared_client is not None:
+        await _shared_client.aclose()
+    _shared_client = _shared_loop = None
+
+@asynccontextmanager
+async def sync_client():
+    """The shared pool when it belongs to this loop, otherwise a client for just this sync."""
+    if _shared_client is not None and _shared_loop is asyncio.get_running_loop():
+        yield _shared_client
+        return
+    # Never more than MAX_CONCURRENCY sockets for one sync
+    async with _new_client(MAX_CONCURRENCY) as http_client:
+        yield http_client
 
 def sanitize_key(key):
     """Sanitize a string to make it a valid Firebase path key."""
     return key.replace('.', '_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_')
 
-def collect_commit_data():
-    all_commit_data = []
-    print("Running", GITHUB_REPO)
-    branches = get_branches()
-    
-    for branch in branches:
-        if MAIN_BRANCH_ONLY and branch['name'] not in ('main', 'master'):
-            print("Skipping branch", branch['name'])
-            continue
-
-        branch_name = branch['name']
-        print("On branch", branch_name)
-        commits = get_commits(branch_name)
-
-        # Use a ThreadPoolExecutor to fetch commit stats in parallel
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # Create a map of future->commit to track which result belongs to which commit
-            futures_to_commit = {executor.submit(get_commit_stats, c.get('sha', '')): c for c in commits}
-
-            for future in as_completed(futures_to_commit): # <--- Process as they complete
-                commit = futures_to_commit[future]
-                try:
-                    stats = future.result()
-                    author = commit.get('commit', {}).get('author', {}).get('email', 'Unknown')
-                    all_commit_data.append({
-                        'login': sanitize_key(author),
-                        'sha': commit.get('sha', ''),
-                        'url': commit.get('html_url', ''),
-                        'timestamp': commit.get('commit', {}).get('author', {}).get('date', ''),
-                        'branch': branch_name,
-                        'message': commit.get('commit', {}).get('message', ''),
-                        'files': stats.get('files', []),
-                        'additions': stats['additions'],
-                        'deletions': stats['deletions'],
-                        'lines_changed': stats['total'],
-                    })
-                except Exception as exc:
-                    print(f"Commit {commit.get('sha')} generated an exception: {exc}")
-
-    print(f'{GITHUB_REPO} commit data aggregated successfully.')
-    return all_commit_data
-
-
-def collect_comment_data(pr_number):
-    # This function now fetches both comment types in parallel for a single PR
-    comments = []
-    urls = [
-        f"{BASE_URL}/repos/{GITHUB_OWNER}/{GITHUB_REPO}/issues/{pr_number}/comments", # Issue comments
-        f"{BASE_URL}/repos/{GITHUB_OWNER}/{GITHUB_REPO}/pulls/{pr_number}/comments"  # Review comments
-    ]
-    
-    def fetch_comments(url):
-        response = requests.get(url, headers=headers)
+class GitHubCollector:
+    """
+    Everything one sync of one repository needs: what to fetch, its marks and incomplete list,
+    and its HTTP client and rate-limit scheduler while collect() runs. Nothing is kept at module
+    level, so any number of syncs can run concurrently in one process.
+    """
+    RESOURCE = 'core'  # rate-limit budget the requests draw from (see scripts/rate_limit.py)
+
+    def __init__(self, owner, repo_name, token, main_branch_only=False, merged_prs_only=False, marks=None, incomplete=None):
+        self.owner, self.repo, self.token = owner, repo_name, token
+        self.main_branch_only, self.merged_prs_only = main_branch_only, merged_prs_only
+        self.marks = marks  # high-water marks from the previous sync, updated in place (see scripts/sync_state.py)
+        self.incomplete = incomplete if incomplete is not None else []  # records that couldn't be fetched
+        self.repo_url = f"{BASE_URL}/repos/{owner}/{repo_name}"
+        self.headers = self.request_headers()
+        self.client = None
+        self.scheduler = None
+
+    def request_headers(self):
+        return {
+            'Authorization': f'token {self.token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+
+    async def collect(self):
+        """Returns (commit_data, pr_data)."""
+        # One pooled HTTP/2 client: connections are reused across every request
+        async with sync_client() as http_client:
+            self.client = http_client
+            self.scheduler = RateLimitScheduler(self.token, MAX_CONCURRENCY, resource=self.RESOURCE)
+            try:
+                commit_data, pr_data = await asyncio.gather(self.collect_commit_data(), self.collect_pr_data())
+            finally:
+                self.client = self.scheduler = None
+        return commit_data, pr_data
+
+    async def http_get(self, url, extra_headers=None):
+        # The scheduler bounds concurrency (tighter as the rate-limit budget runs low) and retries rate limits
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
+        return await self.scheduler.request(lambda: metrics.github_call(lambda: self.client.get(url, headers=headers)))
+
+    async def conditional_get(self, url):
+        """
+        GET a single page using the ETag cache.
+        Returns (status_code, data, next_url); a 304 is served from the cache as a 200.
+        """
+        entry = await asyncio.to_thread(github_cache.load_entry, url)
+        response = await self.http_get(url, github_cache.conditional_headers(entry))
+        if response.status_code == 304 and entry is not None:
+            return 200, entry['body'], entry.get('next')
+        if response.status_code != 200:
+            return response.status_code, None, None
+        data = response.json()
+        next_url = response.links.get('next', {}).get('url')
+        await asyncio.to_thread(github_cache.save_entry, url, response.headers.get('ETag'), response.headers.get('Last-Modified'), data, next_url)
+        return 200, data, next_url
+
+    async def get_all_pages(self, url, stop=None):
+        """
+        Follow `Link: rel="next"` headers and return the concatenated list.
+        If `stop(item)` returns True, that item and everything after it are dropped.
+        """
+        items = []
+        while url:
+            status_code, data, next_url = await self.conditional_get(url)
+            if status_code != 200:
+                raise Exception(f"GET {url} returned status code {status_code}")
+            for item in data:
+                if stop and stop(item):
+                    return items
+                items.append(item)
+            url = next_url
+        return items
+
+    async def get_branches(self):
+        url = f"{self.repo_url}/branches?per_page={PER_PAGE}"
+        try:
+            return await self.get_all_pages(url)
+        except Exception as e:
+            raise Exception(f"Failed to fetch branches. {e}")
+
+    async def get_commits(self, branch_name, since=None):
+        params = {'sha': branch_name, 'per_page': PER_PAGE}
+        if since:
+            params['since'] = since
+        query = urlencode(params)
+        url = f"{self.repo_url}/commits?{query}"
+        try:
+            return await self.get_all_pages(url)
+        except Exception as e:
+            raise Exception(f"Failed to fetch commits on branch {branch_name}. {e}")
+
+    async def get_commit_stats(self, commit_sha):
+        cached = await asyncio.to_thread(commit_stats_cache.get, commit_sha)
+        if cached is not None:
+            return cached
+
+        # Not routed through the ETag cache: the stats cache already covers this URL,
+        # and storing full commit bodies (with patches) on disk would be wasteful.
+        url = f"{self.repo_url}/commits/{commit_sha}"
+        response = await self.http_get(url)
         if response.status_code == 200:
-            return response.json()
-        return []
+            data = response.json()
+            file_data = data.get('files', '')
+            files = []
+            additions = 0
+            deletions = 0
+            total = 0
+            for file in file_data:
+                files.append(file['filename'])
+                additions += file['additions']
+                deletions += file['deletions']
+                total += file['changes']
+            stats = {
+                'files': files,
+                'additions': additions,
+                'deletions': deletions,
+                'total': total
+            }
+            await asyncio.to_thread(commit_stats_cache.put, commit_sha, stats)
+            return stats
+        # Never zero-fill: a missing commit is reported, zeros would silently corrupt line counts
+        raise Exception(f"Failed to fetch stats for commit {commit_sha}. Status code: {response.status_code}")
+
+    async def collect_commit_data(self):
+        all_commit_data = []
+        logger.info("Fetching commits for %s", self.repo)
+        branches = await self.get_branches()
+
+        branch_commits = []
+        for branch in branches:
+            if self.main_branch_only and branch['name'] not in ('main', 'master'):
+                logger.debug("Skipping branch %s", branch['name'])
+                continue
+
+            branch_name = branch['name']
+            tip_sha = branch.get('commit', {}).get('sha', '')
+            previous = (self.marks or {}).get('branches', {}).get(branch_key(branch_name))
+            if previous and previous.get('sha') == tip_sha:
+                logger.debug("Branch unchanged since last sync: %s", branch_name)
+                continue
+            branch_commits.append((branch_name, tip_sha, previous))
+
+        # List every changed branch concurrently
+        commit_lists = await asyncio.gather(*[
+            self.get_commits(branch_name, previous.get('since') if previous else None)
+            for branch_name, _, previous in branch_commits
+        ])
+
+        for (branch_name, tip_sha, previous), commits in zip(branch_commits, commit_lists):
+            logger.debug("On branch %s", branch_name)
+            if previous:
+                # `since` is inclusive, so the commit at the previous mark comes back again
+                commits[:] = [c for c in commits if c.get('sha') != previous.get('sha')]
+
+            if self.marks is not None:
+                since = previous.get('since') if previous else None
+                commit_dates = [c.get('commit', {}).get('committer', {}).get('date', '') for c in commits]
+                self.marks.setdefault('branches', {})[branch_key(branch_name)] = {
+                    'name': branch_name,
+                    'sha': tip_sha,
+                    'since': max(commit_dates + [since or ''])
+                }
+
+        # A commit reachable from several branches only needs its stats fetched once
+        unique_shas = list({c.get('sha', '') for commits in commit_lists for c in commits})
+        results = await asyncio.gather(*[self.get_commit_stats(sha) for sha in unique_shas], return_exceptions=True)
+
+        stats_by_sha = {}
+        for sha, result in zip(unique_shas, results):
+            if isinstance(result, Exception):
+                logger.warning("Commit %s generated an exception: %s", sha, result)
+                self.incomplete.append({'type': 'commit', 'id': sha, 'error': str(result)})
+                continue
+            stats_by_sha[sha] = result
+
+        for (branch_name, _, _), commits in zip(branch_commits, commit_lists):
+            for commit in commits:
+                stats = stats_by_sha.get(commit.get('sha', ''))
+                if stats is None:
+                    continue
+                author = commit.get('commit', {}).get('author', {}).get('email', 'Unknown')
+                all_commit_data.append({
+                    'login': sanitize_key(author),
+                    'sha': commit.get('sha', ''),
+                    'url': commit.get('html_url', ''),
+                    'timestamp': commit.get('commit', {}).get('author', {}).get('date', ''),
+                    'branch': branch_name,
+                    'message': commit.get('commit', {}).get('message', ''),
+                    'files': stats.get('files', []),
+                    'additions': stats['additions'],
+                    'deletions': stats['deletions'],
+                    'lines_changed': stats['total'],
+                })
+
+        logger.info("%s commit data aggregated successfully.", self.repo)
+        return all_commit_data
+
+
+    async def collect_comment_data(self, pr_number):
+        # Fetches both comment types concurrently for a single PR
+        comments = []
+        urls = [
+            f"{self.repo_url}/issues/{pr_number}/comments?per_page={PER_PAGE}", # Issue comments
+            f"{self.repo_url}/pulls/{pr_number}/comments?per_page={PER_PAGE}"  # Review comments
+        ]
+
+        # A failure here fails the whole PR rather than storing it with missing comments
+        issue_comments, review_comments = await asyncio.gather(*[self.get_all_pages(url) for url in urls])
 
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        results = executor.map(fetch_comments, urls)
-        
         # Process issue comments
-        for comment in next(results, []):
+        for comment in issue_comments:
             comments.append({
                 'login': sanitize_key(comment.get('user', {}).get('login', 'unknown')),
                 'body': comment.get('body', ''),
@@ -121,7 +284,7 @@ def collect_comment_data(pr_number):
                 'type': 'issue_comment'
             })
         # Process review comments
-        for comment in next(results, []):
+        for comment in review_comments:
             comments.append({
                 'login': sanitize_key(comment.get('user', {}).get('login', 'unknown')),
                 'body': comment.get('body', ''),
@@ -130,70 +293,70 @@ def collect_comment_data(pr_number):
                 'comment_id': comment.get('id', ''),
                 'type': 'review_comment'
             })
-            
-    users_to_comments = {}
-    for comment in comments:
-        user = comment['login']
-        if user not in users_to_comments:
-            users_to_comments[user] = []
-        users_to_comments[user].append(comment)
-    
-    return users_to_comments
-
-
-def collect_pr_data():
-    all_pr_data = []
-    print("Fetching PRs for", GITHUB_REPO)
-    url = f"{BASE_URL}/repos/{GITHUB_OWNER}/{GITHUB_REPO}/pulls?state=all"
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    pulls = response.json()
-
-    # Filter PRs first
-    if MERGED_PRS_ONLY:
-        pulls = [pr for pr in pulls if pr.get('merged_at')]
-
-    # Use a ThreadPoolExecutor to fetch comments for all PRs in parallel
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures_to_pr = {executor.submit(collect_comment_data, pr.get('number', '')): pr for pr in pulls}
-        
-        for future in as_completed(futures_to_pr): # <--- Process as they complete
-            pr = futures_to_pr[future]
-            try:
-                comments = future.result()
-                all_pr_data.append({
-                    'login': sanitize_key(pr.get('user', {}).get('login', None)),
-                    'pr_number': pr.get('number', ''),
-                    'url': pr.get('html_url', ''),
-                    'diff_url': pr.get('diff_url', ''),
-                    'title': pr.get('title', ''),
-                    'body': pr.get('body', ''),
-                    'timestamp': pr.get('created_at', ''),
-                    'merged_at': pr.get('merged_at', ''),
-                    'closed_at': pr.get('closed_at', ''),
-                    'merge_commit_sha': pr.get('merge_commit_sha', ''),
-                    'state': pr.get('state', ''),
-                    'comments': comments,
-                })
-            except Exception as exc:
-                print(f"PR #{pr.get('number')} generated an exception: {exc}")
-
-    print(f'{GITHUB_REPO} pull request data aggregated successfully.')
-    return all_pr_data
-
-# The main fetch_data function remains the same
-def fetch_data(owner, repo_name, main_branch_only, merged_prs_only, token):
-    global GITHUB_OWNER, GITHUB_REPO, GITHUB_TOKEN, MAIN_BRANCH_ONLY, MERGED_PRS_ONLY, headers
-    GITHUB_OWNER, GITHUB_REPO, MAIN_BRANCH_ONLY, MERGED_PRS_ONLY, GITHUB_TOKEN = owner, repo_name, main_branch_only, merged_prs_only, token
-    headers = {
-        'Authorization': f'token {GITHUB_TOKEN}',
-        'Accept': 'application/vnd.github.v3+json'
-    }
-
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        future_commit_data = executor.submit(collect_commit_data)
-        future_pr_data = executor.submit(collect_pr_data)
-        commit_data = future_commit_data.result()
-        pr_data = future_pr_data.result()
-
-    return commit_data, pr_data
\ No newline at end of file
+
+        users_to_comments = {}
+        for comment in comments:
+            user = comment['login']
+            if user not in users_to_comments:
+                users_to_comments[user] = []
+            users_to_comments[user].append(comment)
+
+        return users_to_comments
+
+
+    async def collect_pr_data(self):
+        all_pr_data = []
+        logger.info("Fetching PRs for %s", self.repo)
+        # Most recently updated first, so an incremental sync can stop at the previous high-water mark
+        url = f"{self.repo_url}/pulls?state=all&sort=updated&direction=desc&per_page={PER_PAGE}"
+        last_updated_at = (self.marks or {}).get('pr_updated_at')
+        stop = (lambda pr: pr.get('updated_at', '') <= last_updated_at) if last_updated_at else None
+        pulls = await self.get_all_pages(url, stop)
+
+        if self.marks is not None:
+            self.marks['pr_updated_at'] = max([pr.get('updated_at', '') for pr in pulls] + [last_updated_at or ''])
+
+        # Filter PRs first
+        if self.merged_prs_only:
+            pulls = [pr for pr in pulls if pr.get('merged_at')]
+
+        # Fetch comments for all PRs concurrently; the shared semaphore bounds the actual requests
+        results = await asyncio.gather(*[self.collect_comment_data(pr.get('number', '')) for pr in pulls], return_exceptions=True)
+
+        for pr, comments in zip(pulls, results):
+            if isinstance(comments, Exception):
+                logger.warning("PR #%s generated an exception: %s", pr.get('number'), comments)
+                self.incomplete.append({'type': 'pull_request', 'id': pr.get('number'), 'error': str(comments)})
+                continue
+            all_pr_data.append({
+                'login': sanitize_key(pr.get('user', {}).get('login', None)),
+                'pr_number': pr.get('number', ''),
+                'url': pr.get('html_url', ''),
+                'diff_url': pr.get('diff_url', ''),
+                'title': pr.get('title', ''),
+                'body': pr.get('body', ''),
+                'timestamp': pr.get('created_at', ''),
+                'updated_at': pr.get('updated_at', ''),
+                'merged_at': pr.get('merged_at', ''),
+                'closed_at': pr.get('closed_at', ''),
+                'merge_commit_sha': pr.get('merge_commit_sha', ''),
+                'state': pr.get('state', ''),
+                'comments': comments,
+            })
+
+        logger.info("%s pull request data aggregated successfully.", self.repo)
+        return all_pr_data
+
+# If `marks` is given (see scripts/sync_state.py), only activity newer than those marks is fetched,
+# and the dict is updated in place with the new high-water marks. Pass {} for a full sync that records marks.
+# Records that can't be fetched are appended to `incomplete` if given; otherwise IncompleteFetchError is raised.
+async def fetch_data_async(owner, repo_name, main_branch_only, merged_prs_only, token, marks=None, incomplete=None):
+    collector = GitHubCollector(owner, repo_name, token, main_branch_only, merged_prs_only, marks, incomplete)
+    commit_data, pr_data = await collector.collect()
+    if collector.incomplete and incomplete is None:
+        raise IncompleteFetchError(collector.incomplete)
+    return commit_data, pr_data
+
+def fetch_data(owner, repo_name, main_branch_only, merged_prs_only, token, marks=None, incomplete=None):
+    """Synchronous entry point for callers outside an event loop."""
+    return asyncio.run(fetch_data_async(owner, repo_name, main_branch_only, merged_prs_only, token, marks, incomplete))
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+from scripts import commit_stats_cache, metrics
+from scripts.fetch_github_data import BASE_URL, GitHubCollector, IncompleteFetchError, sanitize_key
+from scripts.sync_state import branch_key
+
+logger = logging.getLogger(__name__)
+
+# GraphQL-backed alternative to scripts/fetch_github_data.py.
+# Commit history (with additions/deletions) and PRs (with issue and review comments) come back
+# in pages of 100, so a sync takes a handful of round trips instead of one per commit and two per PR.
+# Produces exactly the same record shapes as collect_commit_data / collect_pr_data.
+
+# Follows GITHUB_API_URL like the REST collector. GitHub Enterprise serves REST under /api/v3
+# and GraphQL at /api/graphql; github.com (and the benchmark mock) at <base>/graphql.
+_base = BASE_URL.rstrip('/')
+GRAPHQL_URL = (_base[:-len('/v3')] if _base.endswith('/api/v3') else _base) + '/graphql'
+PAGE_SIZE = 100
+THREADS_PAGE_SIZE = 50         # review threads per PR in the bulk query
+THREAD_COMMENTS_PAGE_SIZE = 20  # comments per review thread in the bulk query (keeps the query under GitHub's node limit)
+
+REFS_QUERY = """
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    refs(refPrefix: "refs/heads/", first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { name target { oid } }
+    }
+  }
+}
+"""
+
+HISTORY_QUERY = """
+query($owner: String!, $name: String!, $ref: String!, $cursor: String, $since: GitTimestamp) {
+  repository(owner: $owner, name: $name) {
+    ref(qualifiedName: $ref) {
+      target {
+        ... on Commit {
+          history(first: 100, after: $cursor, since: $since) {
+            pageInfo { hasNextPage endCursor }
+            nodes { oid url message committedDate additions deletions author { email date } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+COMMENT_FIELDS = "databaseId body createdAt author { login }"
+
+PULLS_QUERY = f"""
+query($owner: String!, $name: String!, $cursor: String) {{
+  repository(owner: $owner, name: $name) {{
+    pullRequests(first: {PAGE_SIZE}, after: $cursor, orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        id number url title body createdAt updatedAt mergedAt closedAt state
+        author {{ login }}
+        mergeCommit {{ oid }}
+        comments(first: {PAGE_SIZE}) {{
+          pageInfo {{ hasNextPage endCursor }}
+          nodes {{ {COMMENT_FIELDS} }}
+        }}
+        reviewThreads(first: {THREADS_PAGE_SIZE}) {{
+          pageInfo {{ hasNextPage endCursor }}
+          nodes {{
+            id
+            comments(first: {THREAD_COMMENTS_PAGE_SIZE}) {{
+              pageInfo {{ hasNextPage endCursor }}
+              nodes {{ {COMMENT_FIELDS} }}
+            }}
+          }}
+        }}
+      }}
+    }}
+  }}
+}}
+"""
+
+# Follow-up query for a single connection that didn't fit in the bulk query
+def _node_connection_query(node_type, field, selection):
+    return f"""
+query($id: ID!, $cursor: String) {{
+  node(id: $id) {{
+    ... on {node_type} {{
+      {field}(first: {PAGE_SIZE}, after: $cursor) {{
+        pageInfo {{ hasNextPage endCursor }}
+        nodes {{ {selection} }}
+      }}
+    }}
+  }}
+}}
+"""
+
+def _comment_record(comment, pr_number, comment_type):
+    return {
+        'login': sanitize_key((comment.get('author') or {}).get('login', 'unknown')),
+        'body': comment.get('body', ''),
+        'timestamp': comment.get('createdAt', ''),
+        'pr_number': pr_number,
+        'comment_id': comment.get('databaseId', ''),
+        'type': comment_type
+    }
+
+class GraphQLCollector(GitHubCollector):
+    """GitHubCollector that fetches through the GraphQL API; see GitHubCollector for the state it holds."""
+    RESOURCE = 'graphql'
+
+    def request_headers(self):
+        return {'Authorization': f'bearer {self.token}'}
+
+    async def graphql(self, query, variables):
+        response = await self.scheduler.request(lambda: metrics.github_call(lambda: self.client.post(GRAPHQL_URL, json={'query': query, 'variables': variables}, headers=self.headers)))
+        if response.status_code != 200:
+            raise Exception(f"GraphQL request failed. Status code: {response.status_code}")
+        payload = response.json()
+        if payload.get('errors'):
+            raise Exception(f"GraphQL request failed: {payload['errors'][0].get('message')}")
+        return payload['data']
+
+    async def remaining_nodes(self, node_type, node_id, field, selection, connection):
+        """Return the nodes of `connection`, fetching any further pages by node id."""
+        nodes = list(connection.get('nodes') or [])
+        page_info = connection.get('pageInfo') or {}
+        query = _node_connection_query(node_type, field, selection)
+        while page_info.get('hasNextPage'):
+            data = await self.graphql(query, {'id': node_id, 'cursor': page_info.get('endCursor')})
+            page = data['node'][field]
+            nodes.extend(page.get('nodes') or [])
+            page_info = page.get('pageInfo') or {}
+        return nodes
+
+    async def get_branches(self):
+        branches = []
+        cursor = None
+        while True:
+            data = await self.graphql(REFS_QUERY, {'owner': self.owner, 'name': self.repo, 'cursor': cursor})
+            refs = data['repository']['refs']
+            branches.extend(refs['nodes'])
+            if not refs['pageInfo']['hasNextPage']:
+                return branches
+            cursor = refs['pageInfo']['endCursor']
+
+    async def get_commits(self, branch_name, since=None):
+        commits = []
+        cursor = None
+        while True:
+            variables = {'owner': self.owner, 'name': self.repo, 'ref': f'refs/heads/{branch_name}', 'cursor': cursor, 'since': since}
+            data = await self.graphql(HISTORY_QUERY, variables)
+            ref = data['repository']['ref']
+            if not ref:
+                raise Exception(f"Failed to fetch commits on branch {branch_name}. Branch not found")
+            history = ref['target']['history']
+            commits.extend(history['nodes'])
+            if not history['pageInfo']['hasNextPage']:
+                return commits
+            cursor = history['pageInfo']['endCursor']
+
+    async def collect_commit_data(self):
+        all_commit_data = []
+        logger.info("Fetching commits for %s (GraphQL)", self.repo)
+        branches = await self.get_branches()
+
+        branch_commits = []
+        for branch in branches:
+            if self.main_branch_only and branch['name'] not in ('main', 'master'):
+                logger.debug("Skipping branch %s", branch['name'])
+                continue
+
+            branch_name = branch['name']
+            tip_sha = (branch.get('target') or {}).get('oid', '')
+            previous = (self.marks or {}).get('branches', {}).get(branch_key(branch_name))
+            if previous and previous.get('sha') == tip_sha:
+                logger.debug("Branch unchanged since last sync: %s", branch_name)
+                continue
+            branch_commits.append((branch_name, tip_sha, previous))
+
+        commit_lists = await asyncio.gather(*[
+            self.get_commits(branch_name, previous.get('since') if previous else None)
+            for branch_name, _, previous in branch_commits
+        ])
+
+        for (branch_name, tip_sha, previous), commits in zip(branch_commits, commit_lists):
+            logger.debug("On branch %s", branch_name)
+            if previous:
+                commits[:] = [c for c in commits if c.get('oid') != previous.get('sha')]
+
+            if self.marks is not None:
+                since = previous.get('since') if previous else None
+                self.marks.setdefault('branches', {})[branch_key(branch_name)] = {
+                    'name': branch_name,
+                    'sha': tip_sha,
+                    'since': max([c.get('committedDate', '') for c in commits] + [since or ''])
+                }
+
+            # GraphQL doesn't expose per-file names; reuse them if the REST collector has cached them
+            cached_stats = await asyncio.to_thread(commit_stats_cache.get_many, [c.get('oid', '') for c in commits])
+            for commit in commits:
+                sha = commit.get('oid', '')
+                author = commit.get('author') or {}
+                cached = cached_stats.get(sha) or {}
+                additions = commit.get('additions', 0)
+                deletions = commit.get('deletions', 0)
+                all_commit_data.append({
+                    'login': sanitize_key(author.get('email') or 'Unknown'),
+                    'sha': sha,
+                    'url': commit.get('url', ''),
+                    'timestamp': author.get('date', ''),
+                    'branch': branch_name,
+                    'message': commit.get('message', ''),
+                    'files': cached.get('files', []),
+                    'additions': additions,
+                    'deletions': deletions,
+                    'lines_changed': additions + deletions,
+                })
+
+        logger.info("%s commit data aggregated successfully.", self.repo)
+        return all_commit_data
+
+    async def collect_comment_data(self, pr):
+        pr_number = pr.get('number', '')
+        issue_comments = await self.remaining_nodes('PullRequest', pr['id'], 'comments', COMMENT_FIELDS, pr['comments'])
+        threads = await self.remaining_nodes(
+            'PullRequest', pr['id'], 'reviewThreads',
+            f"id comments(first: {THREAD_COMMENTS_PAGE_SIZE}) {{ pageInfo {{ hasNextPage endCursor }} nodes {{ {COMMENT_FIELDS} }} }}",
+            pr['reviewThreads']
+        )
+        thread_comments = await asyncio.gather(*[
+            self.remaining_nodes('PullRequestReviewThread', t['id'], 'comments', COMMENT_FIELDS, t['comments'])
+            for t in threads
+        ])
+
+        comments = [_comment_record(c, pr_number, 'issue_comment') for c in issue_comments]
+        comments += [_comment_record(c, pr_number, 'review_comment') for nodes in thread_comments for c in nodes]
+
+        users_to_comments = {}
+        for comment in comments:
+            users_to_comments.setdefault(comment['login'], []).append(comment)
+        return users_to_comments
+
+    async def collect_pr_data(self):
+        all_pr_data = []
+        logger.info("Fetching PRs for %s (GraphQL)", self.repo)
+        last_updated_at = (self.marks or {}).get('pr_updated_at')
+
+        pulls = []
+        cursor = None
+        while True:
+            data = await self.graphql(PULLS_QUERY, {'owner': self.owner, 'name': self.repo, 'cursor': cursor})
+            connection = data['repository']['pullRequests']
+            page = connection['nodes']
+            # Most recently updated first, so an incremental sync can stop at the previous high-water mark
+            if last_updated_at:
+                fresh = [pr for pr in page if pr.get('updatedAt', '') > last_updated_at]
+                pulls.extend(fresh)
+                if len(fresh) < len(page):
+                    break
+            else:
+                pulls.extend(page)
+            if not connection['pageInfo']['hasNextPage']:
+                break
+            cursor = connection['pageInfo']['endCursor']
+
+        if self.marks is not None:
+            self.marks['pr_updated_at'] = max([pr.get('updatedAt', '') for pr in pulls] + [last_updated_at or ''])
+
+        if self.merged_prs_only:
+            pulls = [pr for pr in pulls if pr.get('mergedAt')]
+
+        results = await asyncio.gather(*[self.collect_comment_data(pr) for pr in pulls], return_exceptions=True)
+
+        for pr, comments in zip(pulls, results):
+            if isinstance(comments, Exception):
+                logger.warning("PR #%s generated an exception: %s", pr.get('number'), comments)
+                self.incomplete.append({'type': 'pull_request', 'id': pr.get('number'), 'error': str(comments)})
+                continue
+            url = pr.get('url', '')
+            all_pr_data.append({
+                'login': sanitize_key((pr.get('author') or {}).get('login', 'ghost')),
+                'pr_number': pr.get('number', ''),
+                'url': url,
+                'diff_url': f"{url}.diff" if url else '',
+                'title': pr.get('title', ''),
+                'body': pr.get('body', ''),
+                'timestamp': pr.get('createdAt', ''),
+                'updated_at': pr.get('updatedAt', ''),
+                'merged_at': pr.get('mergedAt'),
+                'closed_at': pr.get('closedAt'),
+                'merge_commit_sha': (pr.get('mergeCommit') or {}).get('oid'),
+                # REST reports merged PRs as 'closed'
+                'state': 'open' if pr.get('state') == 'OPEN' else 'closed',
+                'comments': comments,
+            })
+
+        logger.info("%s pull request data aggregated successfully.", self.repo)
+        return all_pr_data
+
+# Same contract as fetch_github_data.fetch_data_async.
+async def fetch_data_graphql_async(owner, repo_name, main_branch_only, merged_prs_only, token, marks=None, incomplete=None):
+    collector = GraphQLCollector(owner, repo_name, token, main_branch_only, merged_prs_only, marks, incomplete)
+    commit_data, pr_data = await collector.collect()
+    if collector.incomplete and incomplete is None:
+        raise IncompleteFetchError(collector.incomplete)
+    return commit_data, pr_data
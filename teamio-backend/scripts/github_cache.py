@@ -0,0 +1,52 @@
+import hashlib
+import json
+import os
+import threading
+
+# Local on-disk cache of GitHub API responses, keyed by request URL.
+# Each entry keeps the ETag / Last-Modified validators so repeat syncs can send
+# conditional requests and get a 304 (which doesn't count against the rate limit).
+# load_entry / save_entry do blocking file I/O; async callers run them with asyncio.to_thread.
+CACHE_DIR = os.getenv("GITHUB_CACHE_DIR", ".github_cache")
+
+def _entry_path(url: str) -> str:
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, "etag", digest[:2], f"{digest}.json")
+
+def load_entry(url: str):
+    """Return the cached entry for url, or None if missing/unreadable."""
+    try:
+        with open(_entry_path(url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_entry(url: str, etag, last_modified, body, next_url=None):
+    """Persist a response body with its validators. No-op if the server sent none."""
+    if not etag and not last_modified:
+        return
+    path = _entry_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "next": next_url,
+        "body": body,
+    }
+    # Write to a temp file first so concurrent readers never see a partial entry
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+def conditional_headers(entry) -> dict:
+    """Build If-None-Match / If-Modified-Since headers from a cached entry."""
+    if not entry:
+        return {}
+    out = {}
+    if entry.get("etag"):
+        out["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        out["If-Modified-Since"] = entry["last_modified"]
+    return out
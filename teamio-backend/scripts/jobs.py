@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Background job queue for ingestion, backed by a local SQLite file so every worker process
+# on the host shares it. Endpoints enqueue a job and return its id; a pool of asyncio workers
+# runs the registered handler for the job's kind and records progress counters as it goes.
+#
+# Jobs with the same dedupe_key (e.g. one GitHub sync per team, repository and options) coalesce
+# while queued or running: a second enqueue returns the id of the job already in flight.
+#
+# Finished (succeeded or failed) jobs are kept for JOB_RETENTION_DAYS so their results can still be
+# polled, then deleted by whichever worker next claims a job.
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = float(os.getenv("JOB_STALE_SECONDS", "600"))  # a running job with no heartbeat for this long is requeued
+RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+PURGE_INTERVAL = 3600  # seconds between retention sweeps in one process
+
+_handlers = {}
+_loop = None
+_wakeup = None
+_worker_tasks = []
+_last_purge = 0.0
+
+@contextmanager
+def _connect():
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def init_db():
+    with _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                team_id TEXT,
+                dedupe_key TEXT,
+                status TEXT NOT NULL,
+                params TEXT,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL,
+                updated_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+
+def _row_to_job(row, include_params=False):
+    job = {
+        'id': row['id'],
+        'kind': row['kind'],
+        'team_id': row['team_id'],
+        'status': row['status'],
+        'progress': json.loads(row['progress'] or '{}'),
+        'result': json.loads(row['result']) if row['result'] else None,
+        'error': row['error'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+    if include_params:
+        job['params'] = json.loads(row['params'] or '{}')
+    return job
+
+def enqueue(kind: str, team_id: str, params: dict, dedupe_key: str = None):
+    """Queue a job. Returns (job_id, coalesced) where coalesced means an in-flight job was reused."""
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if dedupe_key:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running') ORDER BY created_at LIMIT 1",
+                    (dedupe_key,)
+                ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row['id'], True
+            job_id = str(uuid.uuid4())
+            conn.execute(
+                "INSERT INTO jobs (id, kind, team_id, dedupe_key, status, params, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, '{}', ?, ?)",
+                (job_id, kind, team_id, dedupe_key, json.dumps(params), now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    if _wakeup is not None:
+        # enqueue may be called from a threadpool thread
+        _loop.call_soon_threadsafe(_wakeup.set)
+    return job_id, False
+
+def get_job(job_id: str):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+def update_progress(job_id: str, counters: dict):
+    """Merge counters into the job's progress (and refresh its heartbeat)."""
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        progress = json.loads(row['progress'] or '{}') if row else {}
+        progress.update(counters)
+        conn.execute("UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?", (json.dumps(progress), time.time(), job_id))
+        conn.execute("COMMIT")
+
+def _heartbeat(job_id: str):
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+def _finish(job_id: str, status: str, result=None, error=None):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, params = NULL, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+
+def _purge_finished(conn):
+    """Delete finished jobs older than the retention period, at most once per PURGE_INTERVAL."""
+    global _last_purge
+    now = time.time()
+    if now - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = now
+    conn.execute(
+        "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+        (now - RETENTION_DAYS * 86400,)
+    )
+
+def _claim_next():
+    """Atomically move the oldest queued job to running and return it, or None."""
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _purge_finished(conn)
+        # Requeue jobs whose worker died without finishing them
+        conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated_at < ?",
+            (time.time() - STALE_AFTER,)
+        )
+        row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), row['id']))
+        conn.execute("COMMIT")
+    job = _row_to_job(row, include_params=True)
+    job['status'] = 'running'
+    return job
+
+def register_handler(kind: str, handler):
+    """handler: async (job_id, params) -> result dict"""
+    _handlers[kind] = handler
+
+async def _run_job(job):
+    handler = _handlers.get(job['kind'])
+    if handler is None:
+        await asyncio.to_thread(_finish, job['id'], 'failed', None, f"No handler for job kind {job['kind']}")
+        return
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await asyncio.to_thread(_heartbeat, job['id'])
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        result = await handler(job['id'], job['params'])
+        await asyncio.to_thread(_finish, job['id'], 'succeeded', result)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job['id'], job['kind'])
+        await asyncio.to_thread(_finish, job['id'], 'failed', None, str(e))
+    finally:
+        beat.cancel()
+
+async def _worker():
+    while True:
+        job = await asyncio.to_thread(_claim_next)
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await _run_job(job)
+
+def start_workers(n: int = JOB_WORKERS):
+    """Start the worker pool on the running event loop."""
+    global _loop, _wakeup
+    init_db()
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    for _ in range(n):
+        _worker_tasks.append(asyncio.create_task(_worker()))
+
+async def stop_workers():
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
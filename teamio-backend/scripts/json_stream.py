@@ -0,0 +1,30 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+# Encoding helpers for the large read endpoints: fast JSON encoding, NDJSON lines,
+# and `fields=` projection so the dashboard only pays for the keys it renders.
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """'a, b,c' -> ['a', 'b', 'c']; None / empty means every field."""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+def project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if fields is None or not isinstance(record, dict):
+        return record
+    return {f: record[f] for f in fields if f in record}
+
+def ndjson_lines(records: Iterable[Dict[str, Any]], fields: Optional[List[str]] = None):
+    for record in records:
+        yield dumps(project(record, fields)) + b"\n"
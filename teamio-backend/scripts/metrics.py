@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+from scripts import json_stream
+
+# Request-level instrumentation. Every database call made through storage.reference() and every
+# GitHub API call is timed and sized here, into:
+#   - process-wide Prometheus counters / histograms, rendered by render() for GET /metrics
+#   - the current HTTP request's RequestStats (a context variable set by MetricsMiddleware and
+#     carried into run_in_threadpool), which becomes the response's Server-Timing header
+# Calls made outside a request (ingestion jobs, scripts) only update the process-wide metrics.
+#
+# METRICS_ENABLED=0 turns the database / GitHub wrappers off. Database byte counts re-encode each
+# value read or written (with orjson when installed); METRICS_DB_BYTES=0 skips that.
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+COUNT_DB_BYTES = os.getenv("METRICS_DB_BYTES", "1") != "0"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HELP = {
+    "teamio_http_requests_total": ("counter", "HTTP requests by route and status."),
+    "teamio_http_request_duration_seconds": ("histogram", "HTTP request latency by route."),
+    "teamio_db_operations_total": ("counter", "Database calls by operation (read / write)."),
+    "teamio_db_operation_seconds_total": ("counter", "Time spent in database calls."),
+    "teamio_db_bytes_total": ("counter", "JSON bytes read from / written to the database."),
+    "teamio_github_requests_total": ("counter", "GitHub API requests by status code."),
+    "teamio_github_request_seconds_total": ("counter", "Time spent in GitHub API requests."),
+    "teamio_github_bytes_total": ("counter", "Response bytes received from the GitHub API."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+_histograms: Dict[Tuple[str, Labels], list] = {}  # [per-bucket counts..., +Inf count, sum]
+
+class RequestStats:
+    """Totals for one HTTP request; updated from the event loop and threadpool threads."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.db_reads = self.db_writes = 0
+        self.db_read_seconds = self.db_write_seconds = 0.0
+        self.db_bytes = 0
+        self.github_calls = 0
+        self.github_seconds = 0.0
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def _inc(name: str, labels: Labels, value: float = 1.0):
+    with _lock:
+        _counters[(name, labels)] = _counters.get((name, labels), 0.0) + value
+
+def _observe(name: str, labels: Labels, value: float):
+    with _lock:
+        row = _histograms.get((name, labels))
+        if row is None:
+            row = _histograms[(name, labels)] = [0] * (len(HTTP_BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(HTTP_BUCKETS):
+            if value <= bound:
+                row[i] += 1
+                break
+        else:
+            row[len(HTTP_BUCKETS)] += 1
+        row[-1] += value
+
+def payload_size(value: Any) -> int:
+    if value is None or not COUNT_DB_BYTES:
+        return 0
+    try:
+        return len(json_stream.dumps(value))
+    except TypeError:  # orjson rejects non-string keys; RTDB stringifies them
+        return len(str(value))
+
+def record_db(op: str, seconds: float, nbytes: int):
+    labels = (("op", op),)
+    _inc("teamio_db_operations_total", labels)
+    _inc("teamio_db_operation_seconds_total", labels, seconds)
+    _inc("teamio_db_bytes_total", labels, nbytes)
+    stats = _current.get()
+    if stats is not None:
+        with stats.lock:
+            if op == "read":
+                stats.db_reads += 1
+                stats.db_read_seconds += seconds
+            else:
+                stats.db_writes += 1
+                stats.db_write_seconds += seconds
+            stats.db_bytes += nbytes
+
+async def github_call(send):
+    """Await send() (an httpx request) and record it as one GitHub API call."""
+    started = time.perf_counter()
+    response = await send()
+    seconds = time.perf_counter() - started
+    _inc("teamio_github_requests_total", (("status", str(response.status_code)),))
+    _inc("teamio_github_request_seconds_total", (), seconds)
+    _inc("teamio_github_bytes_total", (), len(response.content))
+    stats = _current.get()
+    if stats is not None:
+        with stats.lock:
+            stats.github_calls += 1
+            stats.github_seconds += seconds
+    return response
+
+def server_timing(stats: RequestStats, total: float) -> str:
+    with stats.lock:
+        parts = [
+            f'db-read;dur={stats.db_read_seconds * 1000:.1f};desc="{stats.db_reads} reads"',
+            f'db-write;dur={stats.db_write_seconds * 1000:.1f};desc="{stats.db_writes} writes"',
+        ]
+        if stats.github_calls:
+            parts.append(f'github;dur={stats.github_seconds * 1000:.1f};desc="{stats.github_calls} calls"')
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+class MetricsMiddleware:
+    """
+    Times each HTTP request, counts it by route template and status, and adds a Server-Timing
+    header. For streamed responses the header covers the work done before the body starts.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(stats, time.perf_counter() - started)
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            # The route template (e.g. /api/jobs/{job_id}), so ids don't become label values
+            path = getattr(route, "path", None) or "unmatched"
+            _inc("teamio_http_requests_total", (("method", scope["method"]), ("route", path), ("status", str(status))))
+            _observe("teamio_http_request_duration_seconds", (("method", scope["method"]), ("route", path)), elapsed)
+            _current.reset(token)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(row) for key, row in _histograms.items()}
+    lines = []
+    for name, (kind, help_text) in _HELP.items():
+        if kind == "histogram":
+            rows = sorted((labels, row) for (n, labels), row in histograms.items() if n == name)
+        else:
+            rows = sorted((labels, value) for (n, labels), value in counters.items() if n == name)
+        if not rows:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in rows:
+            if kind != "histogram":
+                lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(HTTP_BUCKETS + ("+Inf",), value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_label_text(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
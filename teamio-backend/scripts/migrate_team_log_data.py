@@ -0,0 +1,41 @@
+from scripts import storage
+
+# One-off migration that copies existing PR and Google Docs comment records into the
+# team-partitioned layout read by /api/reflections/feedback:
+#   team_log_data/{team_id}/github/pull_request/{contribution_id}
+#   team_log_data/{team_id}/google_docs/comment/{contribution_id}
+# New ingests write these copies themselves; the global log_data tables are left untouched.
+
+PARTITIONED = {
+    ('github', 'pull_request'),
+    ('google_docs', 'comment'),
+}
+
+def migrate_team_log_data():
+    try:
+        storage.init()
+
+        # Log records don't reliably carry a team, so membership comes from each team's contributions
+        contributions = storage.reference('contributions').get() or {}
+        log_data = {
+            (tool, metric): storage.reference(f'log_data/{tool}/{metric}').get() or {}
+            for tool, metric in PARTITIONED
+        }
+
+        for team_id, team_contributions in contributions.items():
+            updates = {}
+            for contribution_id, contribution in (team_contributions or {}).items():
+                key = (contribution.get('tool'), contribution.get('metric'))
+                record = log_data.get(key, {}).get(contribution_id)
+                if record:
+                    updates[f'{key[0]}/{key[1]}/{contribution_id}'] = record
+            if updates:
+                storage.reference(f'team_log_data/{team_id}').update(updates)
+            print(f"Team {team_id}: copied {len(updates)} record(s).")
+
+        print("Team log data migration completed.")
+    except Exception as e:
+        print(f"An error occurred while migrating team log data: {e}")
+
+if __name__ == "__main__":
+    migrate_team_log_data()
@@ -1,10 +1,15 @@
 import uuid
 import os
+import logging
 import re
+import multiprocessing
 from datetime import datetime, timezone
-from typing import Dict, Any, List
-from firebase_admin import db
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from scripts import reflection_aggregates, team_cache, docs_stream, revision_compaction, content_hashes, storage
+
+logger = logging.getLogger(__name__)
 
 def _uuid5(key: str) -> str:
     return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
@@ -21,11 +26,26 @@ def _email_to_net_id(email: str) -> str:
 def sanitize_key(key):
     return key.replace('.', '_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_')
 
-def _fmt_title_from_ts(ts: str, type_str: str) -> str:
+# Same matches as r"\b\w+\b": every maximal run of word characters
+_WORD_RE = re.compile(r"\w+")
+# Valid UTC or naive ISO timestamps (the common case in exports), which format by slicing alone.
+# Days 29-31 take the datetime path so invalid dates still fall back to the raw string.
+_UTC_TS_RE = re.compile(
+    r"\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|1\d|2[0-8])T(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d"
+    r"(?:\.\d{1,6})?(?:Z|[+-]00:?00)?"
+)
+
+def count_words(text: str) -> int:
+    # subn counts matches without building a list of them
+    return _WORD_RE.subn("", text)[1]
+
+def _format_title(ts: str, type_str: str) -> str:
     """
     Format ISO timestamp to '[Type] — YYYY-MM-DD HH:MM:SS' format.
     Falls back to raw timestamp if parsing fails.
     """
+    if ts and _UTC_TS_RE.fullmatch(ts):
+        return f"{type_str} — {ts[:10]} {ts[11:19]}"
     try:
         # Normalize 'Z' -> UTC
         iso = ts.replace("Z", "+00:00")
@@ -37,6 +57,14 @@ def _fmt_title_from_ts(ts: str, type_str: str) -> str:
     except Exception:
         return f"{type_str} — {ts or 'Unknown'}"
 
+# Per-record path (streamed uploads): bursts of edits share a timestamp, so repeats hit the cache
+_fmt_title_from_ts = lru_cache(maxsize=65536)(_format_title)
+
+def fmt_titles_from_ts(stamps: List[str], type_str: str) -> List[str]:
+    """Titles for a whole document's timestamps at once; each distinct value is parsed once."""
+    titles = {ts: _format_title(ts, type_str) for ts in set(stamps)}
+    return [titles[ts] for ts in stamps]
+
 def process_docs_revisions(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Process document revisions into contribution records.
@@ -47,98 +75,120 @@ def process_docs_revisions(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
       - word_count: word count from stats or computed from text
     """
     file = doc.get("file", {}) or {}
+    blocks: List[Dict[str, Any]] = (doc.get("revision") or {}).get("blocks", []) or []
+    titles = fmt_titles_from_ts([b.get("timestamp", "") or "" for b in blocks], "Revision")
+    return [revision_record(b, idx, file, title) for idx, (b, title) in enumerate(zip(blocks, titles))]
+
+def revision_record(b: Dict[str, Any], idx: int, file: Dict[str, Any], title: str = None) -> Dict[str, Any]:
+    """One revision contribution from block number idx of the document; title if already formatted."""
     file_id = file.get("id", "unknown_file")
     file_name = file.get("name", "Untitled")
     file_url = file.get("url", "")
 
-    blocks: List[Dict[str, Any]] = (doc.get("revision") or {}).get("blocks", []) or []
+    author_email = _author_to_email(b.get("author"))
+    ts = b.get("timestamp", "") or ""
+    raw_type = (b.get("type") or "revision").strip()
+    typ = raw_type.lower()
+    if typ == "insert_tile":
+        typ = "insert"
+    elif typ == "deletion":
+        typ = "delete"
+
+    final_text = (b.get("finalText") or b.get("text") or "").strip()
 
-    out: List[Dict[str, Any]] = []
-    for idx, b in enumerate(blocks):
-        author_email = _author_to_email(b.get("author"))
-        ts = b.get("timestamp", "") or ""
-        raw_type = (b.get("type") or "revision").strip()
-        typ = raw_type.lower()
-        if typ == "insert_tile":
-            typ = "insert"
-        elif typ == "deletion":
-            typ = "delete"
-
-        final_text = (b.get("finalText") or b.get("text") or "").strip()
-
-        # Get word count from stats if available, otherwise compute from text
-        stats = b.get("stats") or {}
-        wc = stats.get("totalWords")
-        if not isinstance(wc, int):
-            # Fallback: count words using regex pattern
-            wc = len(re.findall(r"\b\w+\b", final_text))
+    # Get word count from stats if available, otherwise compute from text
+    stats = b.get("stats") or {}
+    wc = stats.get("totalWords")
+    if not isinstance(wc, int):
+        # Fallback: count words using regex pattern
+        wc = count_words(final_text)
 
+    if title is None:
         title = _fmt_title_from_ts(ts, "Revision")
-        # Generate stable ID from file, revision details, and text sample
-        cid = _uuid5(f"{file_id}:rev:{ts}:{idx}:{typ}:{final_text[:64]}")
-
-        out.append({
-            "contribution_id": cid,
-            "login": author_email,
-            "timestamp": ts,
-            "tool": "google_docs",
-            "metric": "revision",
-            "action": typ,
-            "title": title,
-            "text": final_text,
-            "word_count": wc,  
-            "team_id": None,
-            "file": {"id": file_id, "name": file_name, "url": file_url},
-        })
-    return out
+    # Generate stable ID from file, revision details, and text sample
+    cid = _uuid5(f"{file_id}:rev:{ts}:{idx}:{typ}:{final_text[:64]}")
+
+    return {
+        "contribution_id": cid,
+        "login": author_email,
+        "timestamp": ts,
+        "tool": "google_docs",
+        "metric": "revision",
+        "action": typ,
+        "title": title,
+        "text": final_text,
+        "word_count": wc,  
+        "team_id": None,
+        "file": {"id": file_id, "name": file_name, "url": file_url},
+    }
 
 def process_docs_comments(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
     file = doc.get("file", {})
+    threads = (doc.get("comments") or {}).get("threads", []) or []
+    titles = fmt_titles_from_ts([t.get("createdTime", "") or t.get("modifiedTime", "") for t in threads], "Comment")
+    return [comment_record(t, file, title) for t, title in zip(threads, titles)]
+
+def comment_record(t: Dict[str, Any], file: Dict[str, Any], title: str = None) -> Dict[str, Any]:
+    """One comment contribution from a comment thread of the document; title if already formatted."""
     file_id = file.get("id", "unknown_file")
     file_name = file.get("name", "Untitled")
     file_url = file.get("url", "")
-    threads = (doc.get("comments") or {}).get("threads", []) or []
 
-    out = []
-    for t in threads:
-        # Get commenter email from various possible fields
-        commenter_email = _author_to_email(
-            t.get("authorEmail") or t.get("author") or t.get("authorName")
-        )
-        created = t.get("createdTime", "") or t.get("modifiedTime", "")
-        thread_id = str(t.get("id", ""))
-
-        # Extract comment content and quoted text
-        content = (t.get("content") or "").strip()
-        quoted = (t.get("quoted") or "").strip()  # Quoted text from document, if present
+    # Get commenter email from various possible fields
+    commenter_email = _author_to_email(
+        t.get("authorEmail") or t.get("author") or t.get("authorName")
+    )
+    created = t.get("createdTime", "") or t.get("modifiedTime", "")
+    thread_id = str(t.get("id", ""))
+
+    # Extract comment content and quoted text
+    content = (t.get("content") or "").strip()
+    quoted = (t.get("quoted") or "").strip()  # Quoted text from document, if present
+    if title is None:
         title = _fmt_title_from_ts(created, "Comment")
 
-        # Extract attribution info for the text being commented on
-        att = t.get("attribution") or {}
-        target_author = att.get("author") or att.get("authorName")
-
-        # Generate stable ID from file, comment thread, and timestamp
-        cid = _uuid5(f"{file_id}:cmt:{thread_id}:{created}")
-        out.append({
-            "contribution_id": cid,
-            "login": commenter_email,
-            "timestamp": created,
-            "tool": "google_docs",
-            "metric": "comment",
-            "team_id": None,
-            "action": "comment",      
-            "text": content,    
-            "title": title,
-            "file": {"id": file_id, "name": file_name, "url": file_url},
-            "comment_target_author": target_author,
-            "quoted_text": quoted or None,
-        })
-    return out
+    # Extract attribution info for the text being commented on
+    att = t.get("attribution") or {}
+    target_author = att.get("author") or att.get("authorName")
+
+    # Generate stable ID from file, comment thread, and timestamp
+    cid = _uuid5(f"{file_id}:cmt:{thread_id}:{created}")
+    return {
+        "contribution_id": cid,
+        "login": commenter_email,
+        "timestamp": created,
+        "tool": "google_docs",
+        "metric": "comment",
+        "team_id": None,
+        "action": "comment",      
+        "text": content,    
+        "title": title,
+        "file": {"id": file_id, "name": file_name, "url": file_url},
+        "comment_target_author": target_author,
+        "quoted_text": quoted or None,
+    }
+
+# Docs writes go out as multi-path updates of at most WRITE_CHUNK_SIZE records each,
+# with up to WRITE_WORKERS chunks in flight at once.
+WRITE_CHUNK_SIZE = int(os.getenv("DOCS_WRITE_CHUNK_SIZE", "500"))
+WRITE_WORKERS = int(os.getenv("DOCS_WRITE_WORKERS", "4"))
+
+def batch_update(path: str, payload: Dict[str, Any]):
+    """ref.update(payload) at path, split into chunks submitted in parallel."""
+    items = list(payload.items())
+    chunks = [dict(items[i:i + WRITE_CHUNK_SIZE]) for i in range(0, len(items), WRITE_CHUNK_SIZE)]
+    if not chunks:
+        return
+    ref = storage.reference(path)
+    with ThreadPoolExecutor(max_workers=min(WRITE_WORKERS, len(chunks))) as executor:
+        futures = [executor.submit(ref.update, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            future.result()
 
 def post_to_contributions_generic(contributions: List[Dict[str, Any]], team_id: str):
+    payloads = {}
     for c in contributions:
         c["team_id"] = team_id
-        ref = db.reference(f'contributions/{team_id}/{c["contribution_id"]}')
         payload = {
             "contribution_id": c["contribution_id"],
             "author": c.get("login") or c.get("author") or "",
@@ -147,20 +197,36 @@ def post_to_contributions_generic(contributions: List[Dict[str, Any]], team_id:
             "metric": c.get("metric", ""),
             "team_id": team_id,
             "title": c.get("title", ""),
+            # Denormalized from log_data so reflections can run off the contributions node alone
+            "action": c.get("action", ""),
         }
-        ref.set(payload)
+        if "word_count" in c:
+            payload["word_count"] = c["word_count"]
+        payloads[c["contribution_id"]] = payload
+    # Each key replaces the whole record, as ref.set() on it would
+    batch_update(f'contributions/{team_id}', payloads)
+
+# Metrics also copied into the team's own partition, team_log_data/{team_id}/google_docs/{metric}
+TEAM_PARTITIONED_METRICS = {"comment"}
 
 def post_to_log_data_docs(contributions: List[Dict[str, Any]]):
     """
     Store full contribution data in log_data tables:
       log_data/google_docs/revision/{contribution_id}
       log_data/google_docs/comment/{contribution_id}
+    Comments are also stored under team_log_data/{team_id}/google_docs/comment/{contribution_id}.
     """
+    log_data_payload = {}
+    team_payloads = {}
     for c in contributions:
         metric = c.get("metric")  # 'revision' or 'comment'
-        ref = db.reference(f'log_data/google_docs/{metric}/{c["contribution_id"]}')
-        ref.set(c)  # store full record (includes 'raw')
-    print(f"Posted {len(contributions)} item(s) to log_data/google_docs/*.")
+        log_data_payload[f'{metric}/{c["contribution_id"]}'] = c  # full record (includes 'raw')
+        if metric in TEAM_PARTITIONED_METRICS and c.get("team_id"):
+            team_payloads.setdefault(c["team_id"], {})[f'{metric}/{c["contribution_id"]}'] = c
+    batch_update('log_data/google_docs', log_data_payload)
+    for team_id, payload in team_payloads.items():
+        batch_update(f'team_log_data/{team_id}/google_docs', payload)
+    logger.debug("Posted %d item(s) to log_data/google_docs/*.", len(contributions))
 
 def post_to_students_and_team(contributions: List[Dict[str, Any]], team_id: str):
     # Collect all logins for team storage
@@ -170,26 +236,27 @@ def post_to_students_and_team(contributions: List[Dict[str, Any]], team_id: str)
         email = c["login"]
         all_logins.add(email)  # Add email as login
 
+    post_team_logins(all_logins, team_id)
+
+def post_team_logins(all_logins, team_id: str):
     # Store all logins in teams/{team_id}/logins for mapping
-    logins_ref = db.reference(f"teams/{team_id}/logins")
+    logins_ref = storage.reference(f"teams/{team_id}/logins")
     existing_logins = logins_ref.get() or {}
     logins_updates = {}
     for login in all_logins:
-        if login not in existing_logins:
-            sanitized_key = login.replace('.', '_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_')
+        sanitized_key = login.replace('.', '_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_')
+        # Existing entries are keyed by the sanitized login; leave them (and their net_id mapping) alone
+        if sanitized_key not in existing_logins:
             logins_updates[sanitized_key] = {
                 'login': login,
                 'net_id': login  # Placeholder until mapped
             }
     if logins_updates:
         logins_ref.update(logins_updates)
-        print(f"Updated team {team_id} with {len(logins_updates)} new logins from Google Docs.")
-
-def post_docs_to_db(doc_json: Dict[str, Any], team_id: str):
-    # Process document data into contributions
-    revs = process_docs_revisions(doc_json)
-    cmts = process_docs_comments(doc_json)
+        logger.info("Updated team %s with %d new logins from Google Docs.", team_id, len(logins_updates))
 
+def post_docs_batch(revs: List[Dict[str, Any]], cmts: List[Dict[str, Any]], team_id: str):
+    """Write processed revisions and comments (everything except the team's logins)."""
     # Store summary data in contributions table
     post_to_contributions_generic(revs, team_id)
     post_to_contributions_generic(cmts, team_id)
@@ -198,7 +265,179 @@ def post_docs_to_db(doc_json: Dict[str, Any], team_id: str):
     post_to_log_data_docs(revs)
     post_to_log_data_docs(cmts)
 
-    # Update student and team records
-    post_to_students_and_team(revs + cmts, team_id)
+    # Update the team's materialized reflection rows
+    rows = reflection_aggregates.revision_rows(revs)
+    rows.update(reflection_aggregates.doc_comment_feedback_rows(cmts))
+    reflection_aggregates.post_reflection_rows(team_id, rows)
+
+def post_docs_to_db(doc_json: Dict[str, Any], team_id: str):
+    # Process document data into contributions
+    revs = process_docs_revisions(doc_json)
+    cmts = process_docs_comments(doc_json)
+    if revision_compaction.ENABLED:
+        revs = revision_compaction.compact_revisions(revs)
+
+    # Skip records unchanged since this document was last ingested
+    manifest = _manifest_path(team_id, doc_json.get("file") or {})
+    known = content_hashes.load_manifest(manifest)
+    total = len(revs) + len(cmts)
+    revs, rev_hashes = content_hashes.select_changed(revs, known)
+    cmts, cmt_hashes = content_hashes.select_changed(cmts, known)
+    logger.info("Google Docs: %d of %d records new or changed", len(revs) + len(cmts), total)
+    if not revs and not cmts:
+        return {"revisions_written": 0, "comments_written": 0}
+
+    try:
+        post_docs_batch(revs, cmts, team_id)
+
+        # Update student and team records
+        post_to_students_and_team(revs + cmts, team_id)
+        content_hashes.save_manifest(manifest, {**rev_hashes, **cmt_hashes})
+    finally:
+        # Drop cached dashboard reads for the team, even after a partial write
+        team_cache.invalidate_team(team_id)
+
+    logger.info("Successfully posted Google Docs data to Firebase.")
+    return {"revisions_written": len(revs), "comments_written": len(cmts)}
+
+def _manifest_path(team_id: str, file: Dict[str, Any]) -> str:
+    return content_hashes.manifest_path(team_id, "google_docs", file.get("id", "unknown_file"))
+
+# Records per write batch when ingesting an export from disk
+STREAM_BATCH_SIZE = int(os.getenv("DOCS_STREAM_BATCH_SIZE", "2000"))
+
+def post_docs_file_to_db(path: str, team_id: str, on_progress=None):
+    """
+    post_docs_to_db for an export saved to disk. The file is parsed incrementally
+    (scripts/docs_stream.py) and written in batches, so the revision history is never
+    held in memory at once. on_progress(counts) is called after each batch.
+    """
+    file = docs_stream.read_file_info(path)
+    counts = {"revisions_written": 0, "comments_written": 0}
+    logins = set()
+    revs, cmts = [], []
+    compactor = revision_compaction.RevisionCompactor() if revision_compaction.ENABLED else None
+    manifest = _manifest_path(team_id, file)
+    known = content_hashes.load_manifest(manifest)
+
+    def flush(final=False):
+        batch_revs = list(revs)
+        if compactor:
+            batch_revs = compactor.feed(batch_revs) + (compactor.flush() if final else [])
+        # Team logins still come from every record, changed or not
+        logins.update(c["login"] for c in batch_revs + cmts)
+        batch_revs, rev_hashes = content_hashes.select_changed(batch_revs, known)
+        batch_cmts, cmt_hashes = content_hashes.select_changed(list(cmts), known)
+        revs.clear()
+        cmts.clear()
+        if not batch_revs and not batch_cmts:
+            return
+        post_docs_batch(batch_revs, batch_cmts, team_id)
+        content_hashes.save_manifest(manifest, {**rev_hashes, **cmt_hashes})
+        counts["revisions_written"] += len(batch_revs)
+        counts["comments_written"] += len(batch_cmts)
+        if on_progress:
+            on_progress(dict(counts))
+
+    try:
+        block_index = 0
+        for kind, item in docs_stream.iter_docs_items(path):
+            if kind == "block":
+                revs.append(revision_record(item, block_index, file))
+                block_index += 1
+            else:
+                cmts.append(comment_record(item, file))
+            if len(revs) + len(cmts) >= STREAM_BATCH_SIZE:
+                flush()
+        flush(final=True)
+
+        # Update team records
+        post_team_logins(logins, team_id)
+    finally:
+        # Drop cached dashboard reads for the team, even after a partial write
+        team_cache.invalidate_team(team_id)
+
+    logger.info("Successfully posted Google Docs data to Firebase.")
+    return counts
+
+# Worker processes for bulk ingestion (defaults to one per core)
+BULK_WORKERS = int(os.getenv("DOCS_BULK_WORKERS", "0")) or os.cpu_count() or 1
+
+def process_docs_file(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """File info, revision and comment records for an export on disk. Runs in a bulk worker process."""
+    file = docs_stream.read_file_info(path)
+    revs, cmts = [], []
+    for kind, item in docs_stream.iter_docs_items(path):
+        if kind == "block":
+            revs.append(revision_record(item, len(revs), file))
+        else:
+            cmts.append(comment_record(item, file))
+    if revision_compaction.ENABLED:
+        revs = revision_compaction.compact_revisions(revs)
+    return file, revs, cmts
+
+def post_docs_files_to_db(files: List[Dict[str, str]], team_id: str, on_progress=None):
+    """
+    Ingest many exports at once. files: [{"path", "name"}]. Documents are parsed and turned
+    into records across BULK_WORKERS processes while this process writes the results in
+    batches of STREAM_BATCH_SIZE records; team logins are merged and posted once at the end.
+    A document that fails to parse is reported in "failed" and doesn't stop the others.
+    """
+    counts = {"documents_processed": 0, "revisions_written": 0, "comments_written": 0}
+    failed = []
+    logins = set()
+    revs, cmts = [], []
+    pending_hashes = {}  # manifest path -> entries to save once the batch is written
+
+    def flush():
+        if not revs and not cmts:
+            return
+        post_docs_batch(revs, cmts, team_id)
+        for manifest, hashes in pending_hashes.items():
+            content_hashes.save_manifest(manifest, hashes)
+        counts["revisions_written"] += len(revs)
+        counts["comments_written"] += len(cmts)
+        revs.clear()
+        cmts.clear()
+        pending_hashes.clear()
+        if on_progress:
+            on_progress(dict(counts))
+
+    if not files:
+        return {**counts, "failed": failed}
+    try:
+        # spawn, not fork: this process runs the event loop and other threads
+        with ProcessPoolExecutor(
+            max_workers=min(BULK_WORKERS, len(files)),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = {executor.submit(process_docs_file, f["path"]): f["name"] for f in files}
+            for future in as_completed(futures):
+                try:
+                    file, doc_revs, doc_cmts = future.result()
+                except Exception as e:
+                    logger.error("Failed to process Google Docs export %s: %s", futures[future], e)
+                    failed.append({"file": futures[future], "error": str(e)})
+                    continue
+                logins.update(c["login"] for c in doc_revs + doc_cmts)
+                # Skip records unchanged since this document was last ingested
+                manifest = _manifest_path(team_id, file)
+                known = content_hashes.load_manifest(manifest)
+                doc_revs, rev_hashes = content_hashes.select_changed(doc_revs, known)
+                doc_cmts, cmt_hashes = content_hashes.select_changed(doc_cmts, known)
+                pending_hashes.setdefault(manifest, {}).update({**rev_hashes, **cmt_hashes})
+                revs.extend(doc_revs)
+                cmts.extend(doc_cmts)
+                counts["documents_processed"] += 1
+                if len(revs) + len(cmts) >= STREAM_BATCH_SIZE:
+                    flush()
+            flush()
+
+        # Update team records
+        post_team_logins(logins, team_id)
+    finally:
+        # Drop cached dashboard reads for the team, even after a partial write
+        team_cache.invalidate_team(team_id)
 
-    print("Successfully posted Google Docs data to Firebase.")
\ No newline at end of file
+    logger.info("Successfully posted %d Google Docs export(s) to Firebase.", counts['documents_processed'])
+    return {**counts, "failed": failed}
@@ -1,15 +1,37 @@
-import firebase_admin
-from firebase_admin import credentials, db
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
+import logging
+from scripts import reflection_aggregates, team_cache, content_hashes, storage
+
+logger = logging.getLogger(__name__)
 
-TEAM_ID = None
 FIREBASE_SERVICE_CREDENTIALS = None
 
+# Secondary indexes maintained on write, so matching a batch against existing records
+# only reads the keys in that batch instead of whole log_data collections:
+#   indexes/github/commit_sha/{sha}: contribution_id
+#   indexes/github/pull_request/{team_id}/pr-{pr_number}: contribution_id  (prefixed so RTDB doesn't turn the node into an array)
+COMMIT_SHA_INDEX = 'indexes/github/commit_sha'
+PR_NUMBER_INDEX = 'indexes/github/pull_request'
+INDEX_LOOKUP_WORKERS = 20
+
+# Metrics also copied into the team's own partition, team_log_data/{team_id}/github/{metric},
+# so per-team readers (e.g. the feedback matrix) don't have to load every team's records
+TEAM_PARTITIONED_METRICS = {'pull_request'}
+
 def _uuid5(key: str) -> str:
     # content-derived stable id (idempotent)
     return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
 
+def lookup_index(index_path, keys):
+    """Fetch index entries for just these keys, in parallel. Returns {key: contribution_id} for the hits."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    with ThreadPoolExecutor(max_workers=INDEX_LOOKUP_WORKERS) as executor:
+        values = executor.map(lambda key: storage.reference(f'{index_path}/{key}').get(), keys)
+        return {key: value for key, value in zip(keys, values) if value}
+
 def process_commit_data(commit_data):
     processed_data = []
     sha_set = set()
@@ -25,164 +47,206 @@ def process_commit_data(commit_data):
 
     # Handle logic for multiple commits by the same author with different logins goes here
     
-    print(f"Removed {dupe_count} duplicate commits.")
+    logger.debug("Removed %d duplicate commits.", dupe_count)
 
-    commits_ref = db.reference(f'log_data/github/commit')
-    existing_commits = commits_ref.get() or {}
-
-    existing_shas = {commit['sha']: commit['contribution_id'] for commit in existing_commits.values()}
+    existing_shas = lookup_index(COMMIT_SHA_INDEX, sha_set)
     count = 0
     for commit in processed_data:
-        if commit['sha'] in existing_shas.keys():
+        if commit['sha'] in existing_shas:
             commit['contribution_id'] = existing_shas[commit['sha']]
             count += 1
     
-    print(f"Matched {count} existing commits with contribution IDs.")
-
-    return processed_data
-
-def process_pr_data(pr_data):
-    processed_data = []
-    pr_number_set = set()
-    dupe_count = 0
-    for pr in pr_data:
-        pr_number = pr['pr_number']
-        if pr_number not in pr_number_set:
-            pr_number_set.add(pr_number)
-            pr['contribution_id'] = _uuid5(f"{TEAM_ID}, pr-{pr_number}")
-            processed_data.append(pr)
-        else:
-            dupe_count += 1
-
-    print(f"Removed {dupe_count} duplicate pull requests.")
-
-    prs_ref = db.reference(f'log_data/github/pull_request')
-    existing_prs = prs_ref.get() or {}
-
-    existing_shas = {pr['pr_number']: pr['contribution_id'] for pr in existing_prs.values()}
-    count = 0
-    for pr in processed_data:
-        if pr['pr_number'] in existing_shas.keys():
-            pr['contribution_id'] = existing_shas[pr['pr_number']]
-            count += 1
-    
-    print(f"Matched {count} existing pull requests with contribution IDs.")
+    logger.debug("Matched %d existing commits with contribution IDs.", count)
 
     return processed_data
 
-def batch_post_to_contributions(commit_data, pr_data):
-    """Prepares and posts all contributions in a single batch."""
-    if not commit_data and not pr_data:
-        return
-
-    contributions_payload = {}
-    
-    # Prepare commit contributions
-    for c in commit_data:
-        path = c['contribution_id']
-        contributions_payload[path] = {
-            'contribution_id': c['contribution_id'],
-            'author': c['login'],
-            'net_id': c['login'],  # Use login as net_id for GitHub data
-            'timestamp': c['timestamp'],
-            'tool': 'github',
-            'metric': 'commit',
-            'team_id': TEAM_ID,
-            'title': c.get('message', ''),
-            'quantity': c.get('lines_changed', 0)
-        }
-        
-    # Prepare PR contributions
-    for pr in pr_data:
-        path = pr['contribution_id']
-        contributions_payload[path] = {
-            'contribution_id': pr['contribution_id'],
-            'author': pr['login'],
-            'net_id': pr['login'],  # Use login as net_id for GitHub data
-            'timestamp': pr['timestamp'],
-            'tool': 'github',
-            'metric': 'pull_request',
-            'team_id': TEAM_ID,
-            'title': pr.get('title', ''),
-            'quantity': 0 # PRs don't have a simple quantity metric here
-        }
-
-    if contributions_payload:
-        ref = db.reference(f'contributions/{TEAM_ID}')
-        ref.update(contributions_payload)
-    print("Batch-posted all contributions to the database.")
-
-def batch_post_to_log_data(data, metric):
-    """Prepares and posts all log data for a given metric in a single batch."""
-    if not data:
-        return
-        
-    log_data_payload = {item['contribution_id']: item for item in data}
-    
-    if log_data_payload:
-        ref = db.reference(f'log_data/github/{metric}')
-        ref.update(log_data_payload)
-    print(f"Batch-posted {len(data)} {metric}(s) to log_data.")
-
-
-def batch_post_to_teams(all_logins):
-    """Updates team logins in a single batch."""
-    if not TEAM_ID:
-        raise ValueError("TEAM_ID is not set.")
-    if not all_logins:
-        return
-
-    ref = db.reference(f'teams/{TEAM_ID}/logins')
-    existing_logins_data = ref.get() or {}
-    existing_logins_set = set(existing_logins_data.keys())
-
-    new_logins_to_add = all_logins - existing_logins_set
-    
-    updates = {}
-    for login in new_logins_to_add:
-        sanitized_key = login.replace('.', '_').replace('$', '_') # etc.
-        updates[sanitized_key] = {
-            'login': login,
-            'net_id': login, # Placeholder
-        }
-
-    if updates:
-        ref.update(updates)
-    print(f"Updated team {TEAM_ID} with {len(updates)} new members.")
-
-
-# --- REFACTORED MAIN ORCHESTRATOR FUNCTION ---
+class TeamWriter:
+    """
+    Writes one team's fetched GitHub data (see post()). The team is held on the instance rather than
+    at module level, so syncs for different teams can write concurrently in one process.
+    """
+    def __init__(self, team_id):
+        self.team_id = team_id
+
+    def process_pr_data(self, pr_data):
+        processed_data = []
+        pr_number_set = set()
+        dupe_count = 0
+        for pr in pr_data:
+            pr_number = pr['pr_number']
+            if pr_number not in pr_number_set:
+                pr_number_set.add(pr_number)
+                pr['contribution_id'] = _uuid5(f"{self.team_id}, pr-{pr_number}")
+                processed_data.append(pr)
+            else:
+                dupe_count += 1
+
+        logger.debug("Removed %d duplicate pull requests.", dupe_count)
+
+        # Scoped to this team: PR numbers are only unique within a repo
+        existing_numbers = lookup_index(f'{PR_NUMBER_INDEX}/{self.team_id}', {f"pr-{n}" for n in pr_number_set})
+        count = 0
+        for pr in processed_data:
+            if f"pr-{pr['pr_number']}" in existing_numbers:
+                pr['contribution_id'] = existing_numbers[f"pr-{pr['pr_number']}"]
+                count += 1
+
+        logger.debug("Matched %d existing pull requests with contribution IDs.", count)
+
+        return processed_data
+
+    def batch_post_to_contributions(self, commit_data, pr_data):
+        """Prepares and posts all contributions in a single batch."""
+        if not commit_data and not pr_data:
+            return
+
+        contributions_payload = {}
+
+        # Prepare commit contributions
+        for c in commit_data:
+            path = c['contribution_id']
+            contributions_payload[path] = {
+                'contribution_id': c['contribution_id'],
+                'author': c['login'],
+                'net_id': c['login'],  # Use login as net_id for GitHub data
+                'timestamp': c['timestamp'],
+                'tool': 'github',
+                'metric': 'commit',
+                'team_id': self.team_id,
+                'title': c.get('message', ''),
+                'quantity': c.get('lines_changed', 0),
+                # Denormalized from log_data so reflections can run off the contributions node alone
+                'additions': c.get('additions', 0),
+                'lines_changed': c.get('lines_changed', 0)
+            }
+
+        # Prepare PR contributions
+        for pr in pr_data:
+            path = pr['contribution_id']
+            contributions_payload[path] = {
+                'contribution_id': pr['contribution_id'],
+                'author': pr['login'],
+                'net_id': pr['login'],  # Use login as net_id for GitHub data
+                'timestamp': pr['timestamp'],
+                'tool': 'github',
+                'metric': 'pull_request',
+                'team_id': self.team_id,
+                'title': pr.get('title', ''),
+                'quantity': 0 # PRs don't have a simple quantity metric here
+            }
+
+        if contributions_payload:
+            ref = storage.reference(f'contributions/{self.team_id}')
+            ref.update(contributions_payload)
+        logger.debug("Batch-posted all contributions to the database.")
+
+    def batch_post_to_log_data(self, data, metric):
+        """Prepares and posts all log data for a given metric in a single batch."""
+        if not data:
+            return
+
+        log_data_payload = {item['contribution_id']: item for item in data}
+
+        if log_data_payload:
+            ref = storage.reference(f'log_data/github/{metric}')
+            ref.update(log_data_payload)
+            if metric in TEAM_PARTITIONED_METRICS:
+                storage.reference(f'team_log_data/{self.team_id}/github/{metric}').update(log_data_payload)
+            self.batch_post_to_index(data, metric)
+        logger.debug("Batch-posted %d %s(s) to log_data.", len(data), metric)
+
+    def batch_post_to_index(self, data, metric):
+        """Keeps the lookup indexes used by process_commit_data / process_pr_data in step with log_data."""
+        if metric == 'commit':
+            storage.reference(COMMIT_SHA_INDEX).update({item['sha']: item['contribution_id'] for item in data})
+        elif metric == 'pull_request':
+            storage.reference(f'{PR_NUMBER_INDEX}/{self.team_id}').update({f"pr-{item['pr_number']}": item['contribution_id'] for item in data})
+
+
+    def batch_post_to_teams(self, all_logins):
+        """Updates team logins in a single batch."""
+        if not self.team_id:
+            raise ValueError("team_id is not set.")
+        if not all_logins:
+            return
+
+        ref = storage.reference(f'teams/{self.team_id}/logins')
+        existing_logins_data = ref.get() or {}
+        existing_logins_set = set(existing_logins_data.keys())
+
+        updates = {}
+        for login in all_logins:
+            sanitized_key = login.replace('.', '_').replace('$', '_') # etc.
+            # Existing entries are keyed by the sanitized login; leave them (and their net_id mapping) alone
+            if sanitized_key in existing_logins_set:
+                continue
+            updates[sanitized_key] = {
+                'login': login,
+                'net_id': login, # Placeholder
+            }
+
+        if updates:
+            ref.update(updates)
+        logger.info("Updated team %s with %d new members.", self.team_id, len(updates))
+
+
+    def batch_post_to_reflections(self, commit_data, pr_data):
+        """Keeps the team's materialized reflection rows in step with this batch."""
+        rows = {}
+        rows.update(reflection_aggregates.commit_rows(commit_data))
+        rows.update(reflection_aggregates.pr_feedback_rows(pr_data))
+        reflection_aggregates.post_reflection_rows(self.team_id, rows)
+
+    # --- REFACTORED MAIN ORCHESTRATOR FUNCTION ---
+
+    def post(self, commit_data, pr_data):
+        # Stage 1: Process and clean data in parallel (unchanged)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_commits = executor.submit(process_commit_data, commit_data)
+            future_prs = executor.submit(self.process_pr_data, pr_data)
+            clean_commit_data = future_commits.result()
+            clean_pr_data = future_prs.result()
+
+        # Drop records identical to what this team last stored (see scripts/content_hashes.py)
+        commit_manifest = content_hashes.manifest_path(self.team_id, 'github', 'commit')
+        pr_manifest = content_hashes.manifest_path(self.team_id, 'github', 'pull_request')
+        clean_commit_data, commit_hashes = content_hashes.select_changed(clean_commit_data, content_hashes.load_manifest(commit_manifest))
+        clean_pr_data, pr_hashes = content_hashes.select_changed(clean_pr_data, content_hashes.load_manifest(pr_manifest))
+        logger.info("%d commit(s) and %d pull request(s) are new or changed.", len(clean_commit_data), len(clean_pr_data))
+        if not clean_commit_data and not clean_pr_data:
+            return {"commits_written": 0, "prs_written": 0}
+
+        try:
+            # Stage 2: Submit all batch database writes to run in parallel
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                # Consolidate all unique logins from both data sources first
+                all_logins = {c['login'] for c in clean_commit_data} | {p['login'] for p in clean_pr_data}
+
+                # Submit all batch operations
+                futures = [
+                    executor.submit(self.batch_post_to_contributions, clean_commit_data, clean_pr_data),
+                    executor.submit(self.batch_post_to_log_data, clean_commit_data, 'commit'),
+                    executor.submit(self.batch_post_to_log_data, clean_pr_data, 'pull_request'),
+                    executor.submit(self.batch_post_to_teams, all_logins),
+                    executor.submit(self.batch_post_to_reflections, clean_commit_data, clean_pr_data)
+                ]
+
+                # Wait for all posting to complete and handle any exceptions
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error("A database posting operation failed: %s", e)
+                        raise
+
+            content_hashes.save_manifest(commit_manifest, commit_hashes)
+            content_hashes.save_manifest(pr_manifest, pr_hashes)
+        finally:
+            # Drop cached dashboard reads for the team, even after a partial write
+            team_cache.invalidate_team(self.team_id)
+
+        logger.info("All database operations completed successfully.")
+        return {"commits_written": len(clean_commit_data), "prs_written": len(clean_pr_data)}
 
 def post_to_db(commit_data, pr_data, team_id=None):
-    global TEAM_ID
-    TEAM_ID = team_id
-
-    # Stage 1: Process and clean data in parallel (unchanged)
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        future_commits = executor.submit(process_commit_data, commit_data)
-        future_prs = executor.submit(process_pr_data, pr_data)
-        clean_commit_data = future_commits.result()
-        clean_pr_data = future_prs.result()
-
-    # Stage 2: Submit all batch database writes to run in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        # Consolidate all unique logins from both data sources first
-        all_logins = {c['login'] for c in clean_commit_data} | {p['login'] for p in clean_pr_data}
-
-        # Submit all batch operations
-        futures = [
-            executor.submit(batch_post_to_contributions, clean_commit_data, clean_pr_data),
-            executor.submit(batch_post_to_log_data, clean_commit_data, 'commit'),
-            executor.submit(batch_post_to_log_data, clean_pr_data, 'pull_request'),
-            executor.submit(batch_post_to_teams, all_logins)
-        ]
-
-        # Wait for all posting to complete and handle any exceptions
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                print(f"A database posting operation failed: {e}")
-                raise
-    
-    print("All database operations completed successfully.")
+    return TeamWriter(team_id).post(commit_data, pr_data)
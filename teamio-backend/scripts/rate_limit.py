@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Adaptive scheduling for GitHub API requests.
+# The remaining primary rate-limit budget is tracked per token (shared by every sync in the process);
+# concurrency is scaled down as that budget runs low, and rate-limited responses are retried.
+
+THROTTLE_BELOW = float(os.getenv("GITHUB_THROTTLE_BELOW", "0.2"))  # start throttling under 20% of the hourly budget
+RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "50"))        # requests kept back for other work on the same token
+MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("GITHUB_BACKOFF_BASE", "1"))        # seconds
+BACKOFF_CAP = float(os.getenv("GITHUB_BACKOFF_CAP", "60"))
+MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "900"))   # longest we'll sleep for a primary limit reset
+
+class RateLimitError(Exception):
+    pass
+
+class TokenBudget:
+    """Last observed X-RateLimit-* values for one token."""
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+
+    def update(self, response_headers):
+        try:
+            if 'X-RateLimit-Limit' in response_headers:
+                self.limit = int(response_headers['X-RateLimit-Limit'])
+            if 'X-RateLimit-Remaining' in response_headers:
+                self.remaining = int(response_headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Reset' in response_headers:
+                self.reset_at = float(response_headers['X-RateLimit-Reset'])
+        except ValueError:
+            pass
+
+    def exhausted(self) -> bool:
+        if self.remaining is None or self.reset_at is None:
+            return False
+        return self.remaining <= RESERVE and self.reset_at > time.time()
+
+_budgets = {}
+
+def get_budget(token, resource='core') -> TokenBudget:
+    # REST ('core') and GraphQL requests draw from separate budgets
+    key = resource + ':' + hashlib.sha256((token or '').encode('utf-8')).hexdigest()
+    if key not in _budgets:
+        _budgets[key] = TokenBudget()
+    return _budgets[key]
+
+def _jittered_backoff(attempt: int) -> float:
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.5)
+
+class RateLimitScheduler:
+    """
+    Gate for one sync's requests. Create it inside the event loop that will use it;
+    the token budget it reads is shared across schedulers.
+    """
+    def __init__(self, token, max_concurrency: int, resource='core'):
+        self.budget = get_budget(token, resource)
+        self.max_concurrency = max_concurrency
+        self._active = 0
+        self._condition = asyncio.Condition()
+
+    def allowed_concurrency(self) -> int:
+        budget = self.budget
+        if budget.remaining is None or not budget.limit:
+            return self.max_concurrency
+        fraction = budget.remaining / budget.limit
+        if fraction >= THROTTLE_BELOW:
+            return self.max_concurrency
+        # Scale linearly down to a single request in flight as the budget approaches zero
+        return max(1, int(self.max_concurrency * fraction / THROTTLE_BELOW))
+
+    async def _wait_for_budget(self):
+        if not self.budget.exhausted():
+            return
+        wait = self.budget.reset_at - time.time() + 1
+        if wait > MAX_WAIT:
+            raise RateLimitError(f"GitHub rate limit exhausted; resets in {int(wait)}s")
+        logger.warning("GitHub rate limit nearly exhausted, waiting %ds for reset.", int(wait))
+        await asyncio.sleep(wait)
+
+    def _retry_delay(self, response, attempt: int):
+        """Seconds to wait before retrying, or None if the response isn't rate-limited."""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        if response.headers.get('X-RateLimit-Remaining') == '0' and self.budget.reset_at:
+            return max(0.0, self.budget.reset_at - time.time()) + 1
+        if response.status_code == 429 or 'rate limit' in response.text.lower():
+            # Secondary rate limit without a Retry-After hint
+            return _jittered_backoff(attempt)
+        return None  # an ordinary 403 (permissions), not worth retrying
+
+    async def request(self, send):
+        """Run `send()` (a coroutine factory returning a response) under the gate, retrying rate limits."""
+        for attempt in range(MAX_RETRIES + 1):
+            await self._wait_for_budget()
+            async with self._condition:
+                await self._condition.wait_for(lambda: self._active < self.allowed_concurrency())
+                self._active += 1
+            try:
+                response = await send()
+            finally:
+                async with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+
+            self.budget.update(response.headers)
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                return response
+            if attempt == MAX_RETRIES or delay > MAX_WAIT:
+                raise RateLimitError(f"GitHub rate limit still in effect after {attempt + 1} attempt(s)")
+            logger.warning("GitHub rate limited (status %s), retrying in %.1fs.", response.status_code, delay)
+            await asyncio.sleep(delay)
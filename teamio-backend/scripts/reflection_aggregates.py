@@ -0,0 +1,154 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from scripts import storage
+
+logger = logging.getLogger(__name__)
+
+# Materialized inputs for the reflection endpoints, maintained by post_to_db and post_docs_to_db
+# so the reflections page reads one node per chart instead of every contribution plus its log_data:
+#   reflections/{team_id}/commit/{contribution_id}:   {author, ts, size, additions}
+#   reflections/{team_id}/revision/{contribution_id}: {author, ts}
+#   reflections/{team_id}/feedback/{contribution_id}: [{giver, receiver, count}, ...]
+# Rows are keyed by contribution id, so re-ingesting the same data overwrites rather than double counts.
+# Authors stay as raw logins; the login -> net_id mapping is applied at read time since it can change.
+#
+# A writer only produces rows for the records it writes, so a team ingested before these rows existed
+# would be left with a partial set. reflections/{team_id}/materialized is set once the team's rows
+# are complete: the first post_reflection_rows for a team also rebuilds the rows for all of its
+# stored contributions (team_rows). The endpoints use the rows only once the marker is there.
+
+MARKER = "materialized"
+BACKFILL_READ_WORKERS = 20
+
+def commit_rows(commit_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        f"commit/{c['contribution_id']}": {
+            "author": c["login"],
+            "ts": c.get("timestamp", ""),
+            "size": c.get("lines_changed", 0),
+            "additions": c.get("additions", 0),
+        }
+        for c in commit_data
+    }
+
+def revision_rows(revisions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        f"revision/{r['contribution_id']}": {
+            "author": r.get("login") or r.get("author") or "",
+            "ts": r.get("timestamp", ""),
+        }
+        for r in revisions
+    }
+
+def pr_feedback_rows(pr_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    rows = {}
+    for pr in pr_data:
+        entries = [
+            {"giver": commenter, "receiver": pr.get("login", "unknown"), "count": len(comments)}
+            for commenter, comments in (pr.get("comments") or {}).items()
+        ]
+        # Write an empty row too, so a PR whose comments were all removed stops counting
+        rows[f"feedback/{pr['contribution_id']}"] = entries or None
+    return rows
+
+def doc_comment_feedback_rows(comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    rows = {}
+    for c in comments:
+        if c.get("login") and c.get("comment_target_author"):
+            rows[f"feedback/{c['contribution_id']}"] = [
+                {"giver": c["login"], "receiver": c["comment_target_author"], "count": 1}
+            ]
+    return rows
+
+def marker_path(team_id: str) -> str:
+    return f"reflections/{team_id}/{MARKER}"
+
+def team_rows(team_id: str, log_data: Dict[tuple, Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Every row for the team, built from its contributions and their log_data records.
+    log_data ({(tool, metric): {contribution_id: record}}) may be preloaded; otherwise each record is read.
+    """
+    contributions = storage.reference(f"contributions/{team_id}").get() or {}
+    wanted = [(cid, (c.get("tool"), c.get("metric"))) for cid, c in contributions.items()
+              if isinstance(c, dict) and (c.get("tool"), c.get("metric")) in _ROW_BUILDERS]
+    if log_data is None:
+        with ThreadPoolExecutor(max_workers=BACKFILL_READ_WORKERS) as executor:
+            found = executor.map(lambda item: storage.reference(f"log_data/{item[1][0]}/{item[1][1]}/{item[0]}").get(), wanted)
+            records = list(zip(wanted, found))
+    else:
+        records = [((cid, key), log_data.get(key, {}).get(cid)) for cid, key in wanted]
+
+    by_kind = {key: [] for key in _ROW_BUILDERS}
+    for (_, key), record in records:
+        if record:
+            by_kind[key].append(record)
+    rows = {}
+    for key, build in _ROW_BUILDERS.items():
+        rows.update(build(by_kind[key]))
+    return rows
+
+def backfill_team(team_id: str, log_data: Dict[tuple, Dict[str, Any]] = None):
+    """Rebuild the team's rows from its stored records and mark them complete."""
+    rows = team_rows(team_id, log_data)
+    if rows:
+        storage.reference(f"reflections/{team_id}").update(rows)
+    storage.reference(marker_path(team_id)).set(True)
+    logger.info("Backfilled %d reflection aggregate row(s) for team %s.", len(rows), team_id)
+
+def post_reflection_rows(team_id: str, rows: Dict[str, Any]):
+    backfill = not storage.reference(marker_path(team_id)).get()
+    if backfill:
+        # This batch's rows win: its records may not have reached log_data yet, or may be stale there
+        rows = {**team_rows(team_id), **rows}
+    if rows:
+        storage.reference(f"reflections/{team_id}").update(rows)
+    if backfill:
+        storage.reference(marker_path(team_id)).set(True)
+    logger.debug("Updated %d reflection aggregate row(s) for team %s%s.", len(rows), team_id, " (backfilled)" if backfill else "")
+
+def summarize_commits(rows: Dict[str, Any], mapped_users: Dict[str, str]):
+    summary = {}
+    timeline_map = {}
+    for row in rows.values():
+        author = mapped_users.get(row.get("author"), row.get("author", "unknown"))
+        entry = summary.setdefault(author, {"commits": 0, "lines": 0})
+        entry["commits"] += 1
+        entry["lines"] += row.get("additions", 0)
+        if row.get("ts"):
+            timeline_map.setdefault(author, []).append({"ts": row["ts"], "size": row.get("size")})
+    timeline = [{"author": author, "contributions": points} for author, points in timeline_map.items()]
+    return {"summary": summary, "timeline": timeline}
+
+def summarize_revisions(rows: Dict[str, Any], mapped_users: Dict[str, str]):
+    summary = {}
+    timeline_map = {}
+    for row in rows.values():
+        author = mapped_users.get(row.get("author"), row.get("author", "unknown"))
+        summary[author] = summary.get(author, 0) + 1
+        if row.get("ts"):
+            timeline_map.setdefault(author, []).append({"ts": row["ts"], "size": 0})
+    timeline = [{"author": author, "contributions": points} for author, points in timeline_map.items()]
+    return {"summary": summary, "timeline": timeline}
+
+def summarize_feedback(rows: Dict[str, Any], team_students: Dict[str, str]):
+    """team_students maps login -> net_id; only pairs where both sides are mapped are counted."""
+    feedback_counts = {}
+    for entries in rows.values():
+        for entry in entries or []:
+            if not entry or entry.get("giver", "").lower() == "copilot":
+                continue
+            giver = team_students.get(entry.get("giver"))
+            receiver = team_students.get(entry.get("receiver"))
+            if not giver or not receiver:
+                continue
+            feedback_counts.setdefault(giver, {})
+            feedback_counts[giver][receiver] = feedback_counts[giver].get(receiver, 0) + entry.get("count", 0)
+    return feedback_counts
+
+_ROW_BUILDERS = {
+    ('github', 'commit'): commit_rows,
+    ('github', 'pull_request'): pr_feedback_rows,
+    ('google_docs', 'revision'): revision_rows,
+    ('google_docs', 'comment'): doc_comment_feedback_rows,
+}
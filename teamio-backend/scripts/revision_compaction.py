@@ -0,0 +1,141 @@
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# Optional compaction of Google Docs revision records before they're written
+# (enable with DOCS_COMPACT_REVISIONS=1):
+#
+# - Coalescing: consecutive blocks by the same author with the same action, each within
+#   DOCS_COALESCE_WINDOW_SECONDS of the previous one, become a single revision. It keeps the
+#   first block's contribution_id and the last block's text, timestamp and word count, plus
+#   `first_timestamp` and `coalesced_blocks`.
+# - Delta storage: each revision's `text` is replaced by `text_delta`, the edit against the
+#   previous revision of the same document (common prefix / suffix lengths and the replaced
+#   middle). Every DOCS_DELTA_KEYFRAME_INTERVAL-th revision keeps its full text, so rebuilding
+#   any revision reads at most that many records; see reconstruct_text.
+#
+# Coalescing changes which contribution ids a document produces, so a deployment should keep
+# the setting stable once documents have been ingested with it.
+
+ENABLED = os.getenv("DOCS_COMPACT_REVISIONS", "").lower() in ("1", "true", "yes")
+COALESCE_WINDOW = float(os.getenv("DOCS_COALESCE_WINDOW_SECONDS", "300"))
+KEYFRAME_INTERVAL = max(1, int(os.getenv("DOCS_DELTA_KEYFRAME_INTERVAL", "20")))
+
+def _parse_ts(ts: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat((ts or "").replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def _common_prefix_len(a: str, b: str) -> int:
+    # Binary search over slice comparisons, which run in C, instead of a per-character loop
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix_len(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def make_delta(base: str, text: str) -> Dict[str, Any]:
+    prefix = _common_prefix_len(base, text)
+    suffix = _common_suffix_len(base, text, min(len(base), len(text)) - prefix)
+    return {"prefix": prefix, "suffix": suffix, "insert": text[prefix:len(text) - suffix]}
+
+def apply_delta(base: str, delta: Dict[str, Any]) -> str:
+    suffix = delta.get("suffix", 0)
+    return base[:delta.get("prefix", 0)] + (delta.get("insert") or "") + (base[len(base) - suffix:] if suffix else "")
+
+class RevisionCompactor:
+    """
+    Compacts one document's revision records, fed in document order (possibly in batches).
+    feed() returns the records that are final so far; flush() returns the rest.
+    """
+    def __init__(self):
+        self._pending = None       # coalesce group still open to the next block
+        self._pending_count = 0
+        self._last_text = None     # full text of the last emitted revision
+        self._last_id = None
+        self._emitted = 0
+
+    def _can_coalesce(self, record: Dict[str, Any]) -> bool:
+        pending = self._pending
+        if pending is None or COALESCE_WINDOW <= 0:
+            return False
+        if pending.get("login") != record.get("login") or pending.get("action") != record.get("action"):
+            return False
+        previous, current = _parse_ts(pending.get("timestamp")), _parse_ts(record.get("timestamp"))
+        if previous is None or current is None:
+            return False
+        return 0 <= (current - previous).total_seconds() <= COALESCE_WINDOW
+
+    def _emit(self) -> Dict[str, Any]:
+        record = self._pending
+        if self._pending_count > 1:
+            record["coalesced_blocks"] = self._pending_count
+        text = record.get("text", "")
+        if self._last_text is not None and self._emitted % KEYFRAME_INTERVAL != 0:
+            delta = make_delta(self._last_text, text)
+            delta["base"] = self._last_id
+            record["text_delta"] = delta
+            del record["text"]
+        self._last_text, self._last_id = text, record["contribution_id"]
+        self._emitted += 1
+        self._pending, self._pending_count = None, 0
+        return record
+
+    def feed(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        out = []
+        for record in records:
+            if self._can_coalesce(record):
+                merged = dict(self._pending)
+                for key in ("text", "timestamp", "title", "word_count"):
+                    if key in record:
+                        merged[key] = record[key]
+                merged.setdefault("first_timestamp", self._pending.get("timestamp"))
+                self._pending = merged
+                self._pending_count += 1
+                continue
+            if self._pending is not None:
+                out.append(self._emit())
+            self._pending, self._pending_count = dict(record), 1
+        return out
+
+    def flush(self) -> List[Dict[str, Any]]:
+        return [self._emit()] if self._pending is not None else []
+
+def compact_revisions(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    compactor = RevisionCompactor()
+    return compactor.feed(records) + compactor.flush()
+
+def reconstruct_text(record: Dict[str, Any], load_field: Callable[[str, str], Any]) -> str:
+    """
+    Full text of a stored revision record. load_field(contribution_id, field) reads one field
+    of another revision record (only `text` / `text_delta` are requested).
+    """
+    deltas = []
+    delta = record.get("text_delta")
+    text = record.get("text")
+    while text is None and delta:
+        deltas.append(delta)
+        base_id = delta.get("base")
+        delta = load_field(base_id, "text_delta")
+        if not delta:
+            text = load_field(base_id, "text")
+            if text is None:
+                raise ValueError(f"Missing base revision {base_id}")
+    text = text or ""
+    for delta in reversed(deltas):
+        text = apply_delta(text, delta)
+    return text
@@ -0,0 +1,405 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from scripts import metrics
+
+# Storage for everything the backend keeps in the Realtime Database. Modules call
+# storage.reference(path) where they used firebase_admin.db.reference(path); the object returned
+# supports the subset of the RTDB reference API this codebase uses:
+#
+#   ref.get(shallow=False) / ref.set(value) / ref.update({key_or_path: value}) / ref.delete()
+#   ref.child(path)
+#   ref.order_by_child(key).start_at(v).end_at(v).equal_to(v).limit_to_first(n).limit_to_last(n).get()
+#
+# STORAGE_BACKEND selects the implementation:
+#   firebase  (default) the live RTDB, initialized by init()
+#   memory    a process-local tree, empty at startup; for benchmarks and load tests
+#   sqlite    the same tree persisted to STORAGE_SQLITE_PATH; a self-hosted single-host mode
+#
+# The local backends follow RTDB semantics where the code relies on them: keys are strings,
+# writing None or {} removes a node, empty parents disappear, update() keys may be multi-segment
+# paths, and queries return {key: child} ordered by the child value (nulls, false, true, numbers,
+# strings, then objects; ties by key). Queries scan the parent's children in Python; there is no
+# secondary index, so they cost O(children) rather than O(result).
+#
+# Every reference is wrapped in InstrumentedReference, which times and sizes each call into
+# scripts/metrics.py (unless METRICS_ENABLED=0).
+
+BACKEND = os.getenv("STORAGE_BACKEND", "firebase").lower()
+SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "storage.sqlite3")
+FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", "TEAMIO_FIREBASE_SERVICE_CREDENTIALS.json")
+FIREBASE_DATABASE_URL = os.getenv("FIREBASE_DATABASE_URL", "https://teamio-test-default-rtdb.firebaseio.com")
+
+_store = None
+_initialized = False
+_init_lock = threading.Lock()
+
+def init():
+    """Connect the configured backend. Safe to call more than once; reference() calls it on first use."""
+    global _store, _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        if BACKEND == "firebase":
+            import firebase_admin
+            from firebase_admin import credentials
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS), {
+                    'databaseURL': FIREBASE_DATABASE_URL
+                })
+        elif _store is None:
+            if BACKEND == "memory":
+                _store = _MemoryStore()
+            elif BACKEND == "sqlite":
+                _store = _SqliteStore(SQLITE_PATH)
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND {BACKEND!r} (expected firebase, memory or sqlite)")
+        _initialized = True
+
+def warm():
+    """Initialize and make one small read, so the first request doesn't pay for connecting."""
+    init()
+    reference("/").get(shallow=True)
+
+def reference(path: str = "/"):
+    if not _initialized:
+        init()
+    if BACKEND == "firebase":
+        from firebase_admin import db
+        ref = db.reference(path)
+    else:
+        ref = LocalReference(_store, _split(path))
+    return InstrumentedReference(ref) if metrics.ENABLED else ref
+
+def reset():
+    """Drop everything in a local backend (benchmarks / load tests)."""
+    if BACKEND == "firebase":
+        raise RuntimeError("reset() is only available for the local storage backends")
+    reference("/").delete()
+
+class InstrumentedReference:
+    """A reference or query of any backend, with each database call recorded in scripts/metrics.py."""
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)  # key, path, ...
+
+    def _read(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        value = fn(*args, **kwargs)
+        metrics.record_db("read", time.perf_counter() - started, metrics.payload_size(value))
+        return value
+
+    def _write(self, fn, *args):
+        started = time.perf_counter()
+        fn(*args)
+        metrics.record_db("write", time.perf_counter() - started, metrics.payload_size(args[0]) if args else 0)
+
+    def get(self, *args, **kwargs):
+        return self._read(self._target.get, *args, **kwargs)
+
+    def set(self, value):
+        self._write(self._target.set, value)
+
+    def update(self, value):
+        self._write(self._target.update, value)
+
+    def delete(self):
+        self._write(self._target.delete)
+
+    def child(self, path):
+        return InstrumentedReference(self._target.child(path))
+
+    def order_by_child(self, path):
+        return InstrumentedReference(self._target.order_by_child(path))
+
+    def start_at(self, value):
+        return InstrumentedReference(self._target.start_at(value))
+
+    def end_at(self, value):
+        return InstrumentedReference(self._target.end_at(value))
+
+    def equal_to(self, value):
+        return InstrumentedReference(self._target.equal_to(value))
+
+    def limit_to_first(self, limit):
+        return InstrumentedReference(self._target.limit_to_first(limit))
+
+    def limit_to_last(self, limit):
+        return InstrumentedReference(self._target.limit_to_last(limit))
+
+# --- Local backends -------------------------------------------------------------------------
+
+def _split(path: str) -> List[str]:
+    return [p for p in str(path).split("/") if p]
+
+def _normalize(value: Any) -> Any:
+    """What RTDB would store for value: JSON types, string keys, no None / empty objects."""
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            v = _normalize(v)
+            if v is not None:
+                out[str(k)] = v
+        return out or None
+    if isinstance(value, (list, tuple)):
+        return json.loads(json.dumps(list(value)))
+    return value
+
+def _clone(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.loads(json.dumps(value))
+    return value
+
+# RTDB ordering for order_by_child: missing/null < false < true < numbers < strings < objects
+def _order_key(value: Any):
+    if value is None:
+        return (0, 0)
+    if value is False:
+        return (1, 0)
+    if value is True:
+        return (2, 0)
+    if isinstance(value, (int, float)):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    return (5, 0)
+
+class _MemoryStore:
+    def __init__(self):
+        self.root = None
+        self.lock = threading.RLock()
+
+    def read(self, parts: List[str], shallow: bool = False) -> Any:
+        with self.lock:
+            node = self.root
+            for k in parts:
+                if not isinstance(node, dict) or k not in node:
+                    return None
+                node = node[k]
+            if shallow and isinstance(node, dict):
+                return {k: True for k in node}
+            return _clone(node)
+
+    def _write_locked(self, parts: List[str], value: Any):
+        if not parts:
+            self.root = value
+            return
+        if value is None:
+            # Remove the node, then any parents it leaves empty
+            path, node = [], self.root
+            for k in parts[:-1]:
+                if not isinstance(node, dict) or k not in node:
+                    return
+                path.append((node, k))
+                node = node[k]
+            if not isinstance(node, dict) or parts[-1] not in node:
+                return
+            del node[parts[-1]]
+            while path and not node:
+                parent, k = path.pop()
+                del parent[k]
+                node = parent
+            if not self.root:
+                self.root = None
+            return
+        if not isinstance(self.root, dict):
+            self.root = {}
+        node = self.root
+        for k in parts[:-1]:
+            if not isinstance(node.get(k), dict):
+                node[k] = {}
+            node = node[k]
+        node[parts[-1]] = value
+
+    def write(self, parts: List[str], value: Any):
+        value = _normalize(value)
+        with self.lock:
+            self._write_locked(parts, value)
+
+    def update(self, parts: List[str], values: Dict[str, Any]):
+        normalized = [(parts + _split(k), _normalize(v)) for k, v in values.items()]
+        with self.lock:
+            for child_parts, v in normalized:
+                self._write_locked(child_parts, v)
+
+class _SqliteStore:
+    """
+    The tree flattened to one row per leaf: nodes(path, value) where path is the '/'-joined key
+    path and value the leaf's JSON. A subtree is the range [path + '/', path + '0') ('0' sorts
+    right after '/'), so reads and deletes are primary-key range scans.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS nodes (path TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def _range(prefix: str):
+        return (prefix + "/", prefix + "0") if prefix else ("", "\U0010ffff")
+
+    def read(self, parts: List[str], shallow: bool = False) -> Any:
+        prefix = "/".join(parts)
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM nodes WHERE path = ?", (prefix,)).fetchone()
+        if row is not None:
+            return json.loads(row[0])
+        lo, hi = self._range(prefix)
+        offset = len(lo) + 1
+        if shallow:
+            rows = conn.execute(
+                "SELECT DISTINCT CASE WHEN instr(substr(path, ?), '/') = 0 THEN substr(path, ?)"
+                " ELSE substr(path, ?, instr(substr(path, ?), '/') - 1) END"
+                " FROM nodes WHERE path >= ? AND path < ?",
+                (offset, offset, offset, offset, lo, hi)
+            ).fetchall()
+            return {r[0]: True for r in rows} or None
+        tree = None
+        for path, value in conn.execute("SELECT path, value FROM nodes WHERE path >= ? AND path < ?", (lo, hi)):
+            keys = path[len(lo):].split("/")
+            if tree is None:
+                tree = {}
+            node = tree
+            for k in keys[:-1]:
+                node = node.setdefault(k, {})
+            node[keys[-1]] = json.loads(value)
+        return tree
+
+    def _write_locked(self, conn: sqlite3.Connection, parts: List[str], value: Any):
+        prefix = "/".join(parts)
+        lo, hi = self._range(prefix)
+        conn.execute("DELETE FROM nodes WHERE path >= ? AND path < ?", (lo, hi))
+        conn.execute("DELETE FROM nodes WHERE path = ?", (prefix,))
+        if value is None:
+            return
+        # A leaf on the way down becomes an object
+        for i in range(len(parts)):
+            conn.execute("DELETE FROM nodes WHERE path = ?", ("/".join(parts[:i]),))
+        rows = []
+        stack = [(prefix, value)]
+        while stack:
+            path, v = stack.pop()
+            if isinstance(v, dict):
+                stack.extend((f"{path}/{k}" if path else k, child) for k, child in v.items())
+            else:
+                rows.append((path, json.dumps(v)))
+        conn.executemany("INSERT INTO nodes (path, value) VALUES (?, ?)", rows)
+
+    def _transaction(self, writes):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for parts, value in writes:
+                self._write_locked(conn, parts, value)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def write(self, parts: List[str], value: Any):
+        self._transaction([(parts, _normalize(value))])
+
+    def update(self, parts: List[str], values: Dict[str, Any]):
+        self._transaction([(parts + _split(k), _normalize(v)) for k, v in values.items()])
+
+class LocalReference:
+    def __init__(self, store, parts: List[str]):
+        self._store = store
+        self._parts = parts
+
+    @property
+    def key(self) -> Optional[str]:
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self) -> str:
+        return "/" + "/".join(self._parts)
+
+    def child(self, path: str) -> "LocalReference":
+        return LocalReference(self._store, self._parts + _split(path))
+
+    def get(self, shallow: bool = False) -> Any:
+        return self._store.read(self._parts, shallow)
+
+    def set(self, value: Any):
+        self._store.write(self._parts, value)
+
+    def update(self, value: Dict[str, Any]):
+        if not isinstance(value, dict) or not value:
+            raise ValueError("Value argument must be a non-empty dictionary.")
+        self._store.update(self._parts, value)
+
+    def delete(self):
+        self._store.write(self._parts, None)
+
+    def order_by_child(self, path: str) -> "LocalQuery":
+        return LocalQuery(self, _split(path))
+
+class LocalQuery:
+    def __init__(self, ref: LocalReference, child_parts: List[str]):
+        self._ref = ref
+        self._child_parts = child_parts
+        self._start = self._end = None
+        self._first = self._last = None
+
+    def _bound(self, value: Any, attr: str) -> "LocalQuery":
+        if value is None:
+            raise ValueError("Query bound must not be None.")
+        setattr(self, attr, value)
+        return self
+
+    def start_at(self, value: Any) -> "LocalQuery":
+        return self._bound(value, "_start")
+
+    def end_at(self, value: Any) -> "LocalQuery":
+        return self._bound(value, "_end")
+
+    def equal_to(self, value: Any) -> "LocalQuery":
+        return self._bound(value, "_start")._bound(value, "_end")
+
+    def limit_to_first(self, limit: int) -> "LocalQuery":
+        self._first = limit
+        return self
+
+    def limit_to_last(self, limit: int) -> "LocalQuery":
+        self._last = limit
+        return self
+
+    def _value_of(self, child: Any) -> Any:
+        for k in self._child_parts:
+            if not isinstance(child, dict):
+                return None
+            child = child.get(k)
+        return child
+
+    def get(self) -> Dict[str, Any]:
+        children = self._ref.get()
+        if not isinstance(children, dict):
+            return {}
+        rows = sorted(
+            ((_order_key(self._value_of(child)), key, child) for key, child in children.items()),
+            key=lambda row: (row[0], row[1])
+        )
+        if self._start is not None:
+            rows = [r for r in rows if r[0] >= _order_key(self._start)]
+        if self._end is not None:
+            rows = [r for r in rows if r[0] <= _order_key(self._end)]
+        if self._first is not None:
+            rows = rows[:self._first]
+        if self._last is not None:
+            rows = rows[-self._last:] if self._last else []
+        return {key: child for _, key, child in rows}
@@ -0,0 +1,30 @@
+import logging
+from scripts import storage
+
+logger = logging.getLogger(__name__)
+
+# Per-team, per-repository high-water marks for incremental GitHub syncs, stored at
+# sync_state/{team_id}/github/{repo_key}, so a team that switches repositories starts the new one from scratch:
+#   branches/{branch_key}: {'name': ..., 'sha': <branch tip at last sync>, 'since': <latest commit date seen>}
+#   pr_updated_at: <latest pull request updated_at seen>
+
+def branch_key(branch_name: str) -> str:
+    """Branch names may contain '/' and other characters that aren't valid in Firebase keys."""
+    return branch_name.replace('.', '_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_').replace('/', '_')
+
+def repo_key(owner: str, repo_name: str) -> str:
+    """'{owner}_{repo}', lowercased since GitHub owner and repository names are case-insensitive."""
+    return branch_key(f"{owner}/{repo_name}".lower())
+
+def _marks_path(team_id: str, owner: str, repo_name: str) -> str:
+    return f'sync_state/{team_id}/github/{repo_key(owner, repo_name)}'
+
+def load_github_marks(team_id: str, owner: str, repo_name: str) -> dict:
+    marks = storage.reference(_marks_path(team_id, owner, repo_name)).get()
+    return marks if isinstance(marks, dict) else {}
+
+def save_github_marks(team_id: str, owner: str, repo_name: str, marks: dict):
+    if not marks:
+        return
+    storage.reference(_marks_path(team_id, owner, repo_name)).update(marks)
+    logger.debug("Saved GitHub sync marks for team %s (%s/%s).", team_id, owner, repo_name)
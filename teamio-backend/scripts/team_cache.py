@@ -0,0 +1,68 @@
+import os
+import threading
+from cachetools import TTLCache
+from scripts import storage
+
+# Read-through cache for the per-team reads behind the dashboard (logins, contributions,
+# reflection aggregates). Entries are evicted least-recently-used when full and expire after
+# TEAM_CACHE_TTL seconds. The write paths call invalidate_team(), so the TTL only bounds how
+# long a write from outside this process (another worker, a one-off script) can go unseen.
+#
+# Cached values are shared between requests; callers must treat them as read-only.
+
+TTL = float(os.getenv("TEAM_CACHE_TTL", "60"))
+MAX_ENTRIES = int(os.getenv("TEAM_CACHE_SIZE", "2048"))
+
+_cache = TTLCache(maxsize=MAX_ENTRIES, ttl=TTL)
+_lock = threading.Lock()  # cachetools caches aren't thread-safe
+_loading = {}             # key -> lock held while one caller loads it, so concurrent misses share a read
+_generations = {}         # team_id -> bumped on invalidation, so a load racing a write isn't cached
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def get_or_load(team_id: str, key, loader):
+    """Return the cached value for (team_id, key), calling loader() to fill it on a miss."""
+    cache_key = (team_id, key)
+    with _lock:
+        if cache_key in _cache:
+            _stats["hits"] += 1
+            return _cache[cache_key]
+        key_lock = _loading.setdefault(cache_key, threading.Lock())
+
+    with key_lock:
+        with _lock:
+            if cache_key in _cache:
+                _stats["hits"] += 1
+                return _cache[cache_key]
+            _stats["misses"] += 1
+            generation = _generations.get(team_id, 0)
+        try:
+            value = loader()
+        finally:
+            with _lock:
+                _loading.pop(cache_key, None)
+        with _lock:
+            if _generations.get(team_id, 0) == generation:
+                _cache[cache_key] = value
+    return value
+
+def read(team_id: str, path: str):
+    """Cached storage.reference(path).get() for a path belonging to team_id."""
+    return get_or_load(team_id, path, storage.reference(path).get)
+
+def invalidate_team(team_id: str):
+    with _lock:
+        _generations[team_id] = _generations.get(team_id, 0) + 1
+        for cache_key in [k for k in _cache.keys() if k[0] == team_id]:
+            _cache.pop(cache_key, None)
+        _stats["invalidations"] += 1
+
+def stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else None,
+            "entries": len(_cache),
+            "max_entries": MAX_ENTRIES,
+            "ttl_seconds": TTL,
+        }
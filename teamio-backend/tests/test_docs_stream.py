@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from scripts import docs_stream
+
+# Top-level scalars are skipped with read_value, so a chunk boundary can land anywhere inside
+# them: after "1.", after "1e" / "1e-", after a leading "-", or inside a literal.
+EXPORT = {
+    "exportVersion": 1.5,
+    "offset": -42,
+    "scale": 2.5e-3,
+    "big": -1E+12,
+    "ratio": -0.125,
+    "flags": [True, False, None, 0, -7.25e2],
+    "file": {"id": "f1", "name": "Doc", "version": 3.75},
+    "revision": {"count": -1.0e1, "blocks": [
+        {"author": "a@x.edu", "timestamp": "2024-09-01T00:00:00.000Z", "type": "insert", "finalText": "hi", "n": 1.5},
+        {"author": "b@x.edu", "timestamp": "2024-09-01T00:00:01.000Z", "type": "deletion", "finalText": "", "n": -3e-2},
+    ]},
+    "trailer": 6.02e23,
+    "comments": {"total": 1e0, "threads": [{"id": "t1", "content": "ok", "score": -9.5}]},
+    "end": -0.5,
+}
+
+@pytest.mark.parametrize("indent", [None, 1])
+def test_chunk_boundaries_inside_numbers(tmp_path, monkeypatch, indent):
+    path = tmp_path / "export.json"
+    text = json.dumps(EXPORT, indent=indent)
+    path.write_text(text, encoding="utf-8")
+    expected = [("block", b) for b in EXPORT["revision"]["blocks"]] + [("thread", t) for t in EXPORT["comments"]["threads"]]
+
+    for size in range(1, len(text) + 1):
+        monkeypatch.setattr(docs_stream, "READ_SIZE", size)
+        assert list(docs_stream.iter_docs_items(str(path))) == expected, f"READ_SIZE={size}"
+        assert docs_stream.read_file_info(str(path)) == EXPORT["file"], f"READ_SIZE={size}"
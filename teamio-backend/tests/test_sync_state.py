@@ -0,0 +1,33 @@
+import pytest
+
+from scripts import storage, sync_state
+
+@pytest.fixture
+def memory_storage(monkeypatch):
+    monkeypatch.setattr(storage, "BACKEND", "memory")
+    monkeypatch.setattr(storage, "_store", None)
+    monkeypatch.setattr(storage, "_initialized", False)
+
+MARKS = {
+    "branches": {"main": {"name": "main", "sha": "abc", "since": "2024-05-01T00:00:00Z"}},
+    "pr_updated_at": "2024-05-02T00:00:00Z",
+}
+
+def test_switching_repositories_starts_without_marks(memory_storage):
+    sync_state.save_github_marks("team-1", "octo-org", "first-repo", MARKS)
+
+    # Another repository for the same team must not inherit the first one's high-water marks
+    assert sync_state.load_github_marks("team-1", "octo-org", "second-repo") == {}
+    assert sync_state.load_github_marks("team-1", "other-org", "first-repo") == {}
+    assert sync_state.load_github_marks("team-2", "octo-org", "first-repo") == {}
+
+    # Switching back picks the first repository's marks up again; names are case-insensitive
+    assert sync_state.load_github_marks("team-1", "Octo-Org", "First-Repo") == MARKS
+
+def test_marks_are_saved_per_repository(memory_storage):
+    second = {"pr_updated_at": "2024-06-01T00:00:00Z"}
+    sync_state.save_github_marks("team-1", "octo-org", "first-repo", MARKS)
+    sync_state.save_github_marks("team-1", "octo-org", "second-repo", second)
+
+    assert sync_state.load_github_marks("team-1", "octo-org", "first-repo") == MARKS
+    assert sync_state.load_github_marks("team-1", "octo-org", "second-repo") == second